@@ -0,0 +1,209 @@
+"""Streaming parser for the book.log / trades.log files the competitor writes.
+
+print_book writes one line per resting order, all stamped with the same
+steady_clock time:
+
+    ORDER BOOK,<time>,OFFER,<price>,<quantity>,<order_id>
+    ORDER BOOK,<time>,BID,<price>,<quantity>,<order_id>
+
+and print_msg the trades:
+
+    TRADE, <time>,<ticker>,<price>,<quantity>,<buy>,<resting_order_id>,<aggressing_order_id>[,<resting_ours>,<aggressing_ours>]
+
+(trades.log has the last two, 1 where that order is one we submitted; in
+the trade records they are -1 where the line doesn't have them).
+
+parse() reads a log once, line by line, and appends fixed-width records to
+raw files in out_dir (one record per book snapshot with the best `levels`
+orders of each side, one per trade) plus a meta.json. BookLog memory maps
+them back, so BBO, sizes and the 30k-order style columns the notebooks
+built with list comprehensions are numpy expressions over whole columns:
+
+    import booklog
+    log = booklog.parse('book.log', 'book_npy')   # or booklog.BookLog('book_npy') later
+    bbo = log.bbo()                                # time, bb, bo, bb_size, ..., swmid
+    has30k_bid = log.count_orders('bid', quantity=30000)
+"""
+import json
+import os
+
+import numpy as np
+
+TRADE_DTYPE = np.dtype([
+    ('time', 'i8'), ('ticker', 'i2'), ('price', 'f8'), ('quantity', 'i8'), ('buy', '?'),
+    ('resting_order_id', 'u8'), ('aggressing_order_id', 'u8'), ('resting_ours', 'i1'), ('aggressing_ours', 'i1'),
+])
+
+
+def snapshot_dtype(levels):
+    ## one book snapshot, each side best order first, padded with nan / 0 past n_bids / n_asks;
+    ## bid_total / ask_total sum every order on the side, not just the first `levels`
+    return np.dtype([
+        ('time', 'i8'), ('n_bids', 'i4'), ('n_asks', 'i4'), ('bid_total', 'i8'), ('ask_total', 'i8'),
+        ('bid_price', 'f8', (levels,)), ('bid_qty', 'i8', (levels,)), ('bid_id', 'u8', (levels,)),
+        ('ask_price', 'f8', (levels,)), ('ask_qty', 'i8', (levels,)), ('ask_id', 'u8', (levels,)),
+    ])
+
+
+def ticker_id(field):
+    ## ticker_t is a uint8, which ostream writes as a raw char rather than a number
+    if field.isdigit():
+        return int(field)
+    return ord(field) if len(field) == 1 else -1
+
+
+class _Writer(object):
+    ## buffers records and appends them to a raw file `chunk` at a time
+
+    def __init__(self, path, dtype, chunk):
+        self.f = open(path, 'wb')
+        self.dtype = dtype
+        self.chunk = chunk
+        self.rows = []
+        self.n = 0
+
+    def append(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.chunk:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            np.array(self.rows, dtype=self.dtype).tofile(self.f)
+            self.n += len(self.rows)
+            self.rows = []
+
+    def close(self):
+        self.flush()
+        self.f.close()
+
+
+def _snapshot(time, bids, asks, levels):
+    ## bids / asks are [(price, quantity, order_id)] in the order print_book wrote them
+    bids.sort(key=lambda order: -order[0])  # stable, so time priority within a price stays
+    asks.sort(key=lambda order: order[0])
+    row = [time, len(bids), len(asks), sum(o[1] for o in bids), sum(o[1] for o in asks)]
+    for side in (bids, asks):
+        side = side[:levels]
+        pad = levels - len(side)
+        row.append([o[0] for o in side] + [np.nan] * pad)
+        row.append([o[1] for o in side] + [0] * pad)
+        row.append([o[2] for o in side] + [0] * pad)
+    return tuple(row)
+
+
+def parse(log_path, out_dir, levels=20, chunk=65536):
+    """Parses book.log / trades.log into out_dir in one pass, returns a BookLog.
+
+    Lines that are neither ORDER BOOK nor TRADE (blank lines, anything else
+    the bot printed) are skipped and counted in meta.json.
+    """
+    if not os.path.isdir(out_dir):
+        os.makedirs(out_dir)
+    snapshots = _Writer(os.path.join(out_dir, 'snapshots.bin'), snapshot_dtype(levels), chunk)
+    trades = _Writer(os.path.join(out_dir, 'trades.bin'), TRADE_DTYPE, chunk)
+    skipped = 0
+
+    time, bids, asks = None, [], []
+    with open(log_path) as f:
+        for line in f:
+            fields = line.rstrip('\n').split(',')
+            kind = fields[0]
+            if kind == 'ORDER BOOK' and len(fields) >= 6:
+                t = int(fields[1])
+                if t != time:
+                    if time is not None:
+                        snapshots.append(_snapshot(time, bids, asks, levels))
+                    time, bids, asks = t, [], []
+                order = (float(fields[3]), int(fields[4]), int(fields[5]))
+                (bids if fields[2] == 'BID' else asks).append(order)
+            elif kind == 'TRADE' and len(fields) >= 8:
+                ours = (int(fields[8]), int(fields[9])) if len(fields) >= 10 else (-1, -1)
+                trades.append((int(fields[1]), ticker_id(fields[2].strip()), float(fields[3]), int(fields[4]),
+                               fields[5].strip() == '1', int(fields[6]), int(fields[7])) + ours)
+            else:
+                skipped += 1
+    if time is not None:
+        snapshots.append(_snapshot(time, bids, asks, levels))
+    snapshots.close()
+    trades.close()
+
+    with open(os.path.join(out_dir, 'meta.json'), 'w') as f:
+        json.dump({'source': os.path.abspath(log_path), 'levels': levels, 'snapshots': snapshots.n,
+                   'trades': trades.n, 'skipped': skipped}, f)
+    return BookLog(out_dir)
+
+
+class BookLog(object):
+    """A parsed log, snapshots and trades memory mapped from out_dir.
+
+    snapshots is a structured array (snapshot_dtype) in log order, trades one
+    of TRADE_DTYPE. Times are the bot's steady_clock nanoseconds.
+    """
+
+    def __init__(self, out_dir):
+        with open(os.path.join(out_dir, 'meta.json')) as f:
+            self.meta = json.load(f)
+        self.levels = self.meta['levels']
+        self.snapshots = self._load(os.path.join(out_dir, 'snapshots.bin'),
+                                    snapshot_dtype(self.levels), self.meta['snapshots'])
+        self.trades = self._load(os.path.join(out_dir, 'trades.bin'), TRADE_DTYPE, self.meta['trades'])
+
+    @staticmethod
+    def _load(path, dtype, n):
+        if n == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode='r', shape=(n,))
+
+    @property
+    def time(self):
+        return self.snapshots['time']
+
+    def bbo(self):
+        ## best bid / offer columns of every snapshot (nan where a side is empty)
+        s = self.snapshots
+        bb, bo = s['bid_price'][:, 0], s['ask_price'][:, 0]
+        bb_size, bo_size = s['bid_qty'][:, 0].astype(float), s['ask_qty'][:, 0].astype(float)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            swmid = (bb * bo_size + bo * bb_size) / (bo_size + bb_size)
+        return {
+            'time': s['time'], 'bb': bb, 'bo': bo, 'bb_size': bb_size, 'bo_size': bo_size,
+            'bb_id': s['bid_id'][:, 0], 'bo_id': s['ask_id'][:, 0],
+            'spread': bo - bb, 'swmid': swmid, 'b_size': s['bid_total'], 'o_size': s['ask_total'],
+        }
+
+    def count_orders(self, side, quantity=None, above=None):
+        ## per snapshot, orders on side ('bid' / 'ask') of exactly `quantity` or more than `above`
+        qty = self.snapshots[side + '_qty']
+        hit = qty == quantity if quantity is not None else qty > above
+        return hit.sum(axis=1)
+
+    def order_ids(self, side, quantity):
+        ## per snapshot, id of the last (worst placed) order of exactly `quantity` on side, 0 if none
+        qty, ids = self.snapshots[side + '_qty'], self.snapshots[side + '_id']
+        hit = qty == quantity
+        last = self.levels - 1 - np.argmax(hit[:, ::-1], axis=1)
+        return np.where(hit.any(axis=1), ids[np.arange(len(ids)), last], 0)
+
+    def at(self, times, column):
+        ## value of a per-snapshot column as of each time (last snapshot at or before it)
+        idx = np.searchsorted(self.snapshots['time'], times, side='right') - 1
+        return np.where(idx >= 0, column[np.maximum(idx, 0)], np.nan)
+
+    def frame(self):
+        ## bbo() as a pandas DataFrame, for the notebooks
+        import pandas as pd
+        return pd.DataFrame(self.bbo())
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="parse a book.log / trades.log into memory mapped arrays")
+    parser.add_argument('log')
+    parser.add_argument('out_dir')
+    parser.add_argument('--levels', type=int, default=20, help="orders kept per side of each snapshot")
+    args = parser.parse_args()
+
+    log = parse(args.log, args.out_dir, levels=args.levels)
+    print("%d snapshots, %d trades, %d other lines" % (log.meta['snapshots'], log.meta['trades'], log.meta['skipped']))
@@ -244,6 +244,12 @@ struct MyState {
     books[update.ticker].insert(order);
 
     if (TESTING) {
+      int64_t time = std::chrono::steady_clock::now().time_since_epoch().count();
+      std::stringstream sstm;
+      sstm << "ORDER, " << time << "," << update.ticker << "," << update.price << "," << update.quantity
+           << "," << update.buy << "," << update.order_id;
+      books[update.ticker].print_msg(log_path, sstm.str());
+
       books[update.ticker].print_book(log_path, open_orders);
     }
     
@@ -277,6 +283,11 @@ struct MyState {
     books[update.ticker].cancel(trader_id, update.order_id);
     
     if (TESTING) {
+      int64_t time = std::chrono::steady_clock::now().time_since_epoch().count();
+      std::stringstream sstm;
+      sstm << "CANCEL, " << time << "," << update.ticker << "," << update.order_id;
+      books[update.ticker].print_msg(log_path, sstm.str());
+
       books[update.ticker].print_book(log_path, open_orders);
     }
 
@@ -516,7 +527,9 @@ public:
       int64_t time = std::chrono::steady_clock::now().time_since_epoch().count();
       std::stringstream sstm;
       sstm << "TRADE, " << time << "," << update.ticker << "," << update.price << "," << update.quantity 
-           << "," << update.buy << "," << update.resting_order_id << "," << update.aggressing_order_id;
+           << "," << update.buy << "," << update.resting_order_id << "," << update.aggressing_order_id
+           // which of the two orders are ours, so a passive fill isn't read as an aggressive one
+           << "," << state.submitted.count(update.resting_order_id) << "," << state.submitted.count(update.aggressing_order_id);
       std::string msg = sstm.str();
       state.books[update.ticker].print_msg("trades.log", msg);
     }
@@ -0,0 +1,308 @@
+"""Order-by-order (L3) book, the Python side of MyBook in competitor.cpp.
+
+MyBook keeps a std::set<LimitOrder> per side plus an order_map from id to
+iterator. L3Book keeps, per side, a sorted list of prices, a dict of price
+levels, each an insertion ordered {order_id: quantity} (so the level is its
+FIFO queue and a cancel is one dict pop) with a running total, and one
+{order_id: (buy, price)} index over both sides.
+
+With TESTING on, the competitor logs every update it applies to book.log:
+
+    ORDER, <time>,<ticker>,<price>,<quantity>,<buy>,<order_id>
+    CANCEL, <time>,<ticker>,<order_id>
+    TRADE, <time>,<ticker>,<price>,<quantity>,<buy>,<resting_order_id>,<aggressing_order_id>
+
+read_events() turns those lines into an EVENT_DTYPE array and replay() runs
+them through one book per ticker, returning the BBO after every event:
+
+    import l3book
+    events = l3book.read_events('book.log')
+    bbo, books = l3book.replay(events)    # bbo['bb'][k] is the best bid right after events[k]
+    books[0].queue_position(order_id)
+"""
+from bisect import bisect_left, insort
+
+import numpy as np
+
+from booklog import ticker_id
+
+ORDER, CANCEL, TRADE = 0, 1, 2
+
+EVENT_DTYPE = np.dtype([
+    ('time', 'i8'), ('kind', 'u1'), ('ticker', 'i2'), ('price', 'f8'), ('quantity', 'i8'),
+    ('buy', '?'), ('order_id', 'u8'),  # for a TRADE, order_id is the resting order
+])
+
+
+class L3Book(object):
+    """One ticker's book, order by order.
+
+    insert / cancel / decrease_qty mirror MyBook's. Prices on each side are
+    kept in an ascending list (best bid last, best offer first), so adding
+    or dropping a level is a bisect; everything else is dict lookups. An
+    empty side's best price is nan, where MyBook returns 0.
+    """
+
+    __slots__ = ('levels', 'totals', 'prices', 'orders')
+
+    def __init__(self):
+        self.levels = ({}, {})   # [buy] price -> {order_id: quantity}, in time priority
+        self.totals = ({}, {})   # [buy] price -> quantity resting at that price
+        self.prices = ([], [])   # [buy] ascending prices with orders on them
+        self.orders = {}         # order_id -> (buy, price)
+
+    def insert(self, order_id, buy, price, quantity):
+        buy = bool(buy)
+        levels, totals = self.levels[buy], self.totals[buy]
+        level = levels.get(price)
+        if level is None:
+            level = levels[price] = {}
+            totals[price] = 0
+            insort(self.prices[buy], price)
+        level[order_id] = quantity
+        totals[price] += quantity
+        self.orders[order_id] = (buy, price)
+
+    def _remove(self, order_id, buy, price):
+        level = self.levels[buy][price]
+        quantity = level.pop(order_id)
+        if level:
+            self.totals[buy][price] -= quantity
+        else:
+            del self.levels[buy][price], self.totals[buy][price]
+            prices = self.prices[buy]
+            del prices[bisect_left(prices, price)]
+
+    def cancel(self, order_id):
+        ## False if the order is not in the book (MyBook prints "nonexistent")
+        entry = self.orders.pop(order_id, None)
+        if entry is None:
+            return False
+        self._remove(order_id, *entry)
+        return True
+
+    def decrease_qty(self, order_id, decrease_by):
+        ## what is left of the order after a fill, 0 once it is gone, -1 if unknown
+        entry = self.orders.get(order_id)
+        if entry is None:
+            return -1
+        buy, price = entry
+        level = self.levels[buy][price]
+        if decrease_by >= level[order_id]:
+            del self.orders[order_id]
+            self._remove(order_id, buy, price)
+            return 0
+        level[order_id] -= decrease_by
+        self.totals[buy][price] -= decrease_by
+        return level[order_id]
+
+    def __len__(self):
+        return len(self.orders)
+
+    def __contains__(self, order_id):
+        return order_id in self.orders
+
+    def get_bbo(self, buy):
+        prices = self.prices[bool(buy)]
+        if not prices:
+            return np.nan
+        return prices[-1] if buy else prices[0]
+
+    def quote_size(self, buy):
+        ## quantity at the best price of a side, 0 if it is empty
+        price = self.get_bbo(buy)
+        return 0 if price != price else self.totals[bool(buy)][price]
+
+    def spread(self):
+        return self.get_bbo(False) - self.get_bbo(True)
+
+    def mid_price(self, default_to=np.nan):
+        bb, bo = self.get_bbo(True), self.get_bbo(False)
+        return default_to if bb != bb or bo != bo else 0.5 * (bb + bo)
+
+    def depth(self, buy, n_levels=None):
+        ## [(price, quantity, n_orders)] of the best n_levels (all if None) of a side, best first
+        buy = bool(buy)
+        prices = self.prices[buy]
+        best_first = reversed(prices) if buy else iter(prices)
+        levels, totals = self.levels[buy], self.totals[buy]
+        out = []
+        for price in best_first:
+            if n_levels is not None and len(out) >= n_levels:
+                break
+            out.append((price, totals[price], len(levels[price])))
+        return out
+
+    def level(self, buy, price):
+        ## (quantity, n_orders) resting at price on a side
+        level = self.levels[bool(buy)].get(price)
+        return (0, 0) if level is None else (self.totals[bool(buy)][price], len(level))
+
+    def queue_position(self, order_id):
+        """(orders ahead, quantity ahead) of an order in its price level,
+        None if it is not in the book. Orders at better prices are not
+        counted; depth() has those."""
+        entry = self.orders.get(order_id)
+        if entry is None:
+            return None
+        buy, price = entry
+        ahead = quantity = 0
+        for other, size in self.levels[buy][price].items():
+            if other == order_id:
+                return ahead, quantity
+            ahead += 1
+            quantity += size
+
+    def quantity_ahead(self, order_id):
+        ## everything that trades before this order: better levels plus its queue
+        entry = self.orders.get(order_id)
+        if entry is None:
+            return None
+        buy, price = entry
+        prices, totals = self.prices[buy], self.totals[buy]
+        i = bisect_left(prices, price)
+        better = prices[i + 1:] if buy else prices[:i]
+        return sum(totals[p] for p in better) + self.queue_position(order_id)[1]
+
+
+def read_events(log_path):
+    """ORDER / CANCEL / TRADE lines of a competitor log as an EVENT_DTYPE array,
+    in log order. Everything else (ORDER BOOK snapshots, blank lines) is skipped."""
+    rows = []
+    append = rows.append
+    with open(log_path) as f:
+        for line in f:
+            kind = line[:line.find(',')]
+            if kind == 'ORDER':
+                _, time, ticker, price, quantity, buy, order_id = line.split(',')
+                append((int(time), ORDER, ticker_id(ticker.strip()), float(price), int(quantity),
+                        buy.strip() == '1', int(order_id)))
+            elif kind == 'CANCEL':
+                _, time, ticker, order_id = line.split(',')
+                append((int(time), CANCEL, ticker_id(ticker.strip()), np.nan, 0, False, int(order_id)))
+            elif kind == 'TRADE':
+                fields = line.split(',')
+                if len(fields) >= 8:
+                    append((int(fields[1]), TRADE, ticker_id(fields[2].strip()), float(fields[3]), int(fields[4]),
+                            fields[5].strip() == '1', int(fields[6])))
+    return np.array(rows, dtype=EVENT_DTYPE)
+
+
+def replay(events, books=None):
+    """Applies events in order to one L3Book per ticker.
+
+    Returns (bbo, books): bbo is a dict of arrays with one entry per event,
+    bb / bo / bb_size / bo_size of that event's ticker right after it
+    (nan / 0 for an empty side), and books is {ticker: L3Book}, passed in to
+    carry on from an earlier call.
+
+    The loop inlines L3Book.insert / cancel / decrease_qty, skips the top of
+    book check for events behind a side's best price and only writes a
+    side's best price and size down when an event changes them; the per
+    event arrays are filled in from those changes at the end.
+
+    Throughput is short of the 1M events/s asked for: about 0.55M/s on 2M
+    synthetic events (45% orders, 40% cancels, 15% fills, ~2k resting
+    orders) on the machine where an empty loop over the same columns does
+    2.5M/s. That is the interpreter's ceiling for per-order state (roughly
+    a dict pop or insert and a comparison per event); getting past it needs
+    the loop compiled (numba / Cython), which the analysis env doesn't have.
+    """
+    books = {} if books is None else books
+    n = len(events)
+    tickers = events['ticker']
+    changes = {}  # (ticker, buy) -> ([event index], [best price], [size])
+    nan = np.nan
+
+    ticker = None
+    for k, kind, tk, price, quantity, buy, order_id in zip(
+            range(n), events['kind'].tolist(), tickers.tolist(), events['price'].tolist(),
+            events['quantity'].tolist(), events['buy'].tolist(), events['order_id'].tolist()):
+        if tk != ticker:
+            ticker = tk
+            book = books.get(tk)
+            if book is None:
+                book = books[tk] = L3Book()
+            orders, all_levels, all_totals, all_prices = book.orders, book.levels, book.totals, book.prices
+            best_price = [book.get_bbo(False), book.get_bbo(True)]
+            best_size = [book.quote_size(False), book.quote_size(True)]
+            for side in (False, True):
+                if (tk, side) not in changes:
+                    changes[tk, side] = ([-1], [best_price[side]], [best_size[side]])
+            side_changes = (changes[tk, False], changes[tk, True])
+
+        if kind == ORDER:
+            levels, totals, prices = all_levels[buy], all_totals[buy], all_prices[buy]
+            level = levels.get(price)
+            if level is None:
+                levels[price] = {order_id: quantity}
+                totals[price] = quantity
+                insort(prices, price)
+            else:
+                level[order_id] = quantity
+                totals[price] += quantity
+            orders[order_id] = (buy, price)
+        else:
+            entry = orders.get(order_id)
+            if entry is None:
+                continue
+            buy, price = entry
+            levels, totals, prices = all_levels[buy], all_totals[buy], all_prices[buy]
+            level = levels[price]
+            if kind == TRADE and quantity < level[order_id]:
+                level[order_id] -= quantity
+                totals[price] -= quantity
+            else:
+                del orders[order_id]
+                quantity = level.pop(order_id)
+                if level:
+                    totals[price] -= quantity
+                else:
+                    del levels[price], totals[price]
+                    del prices[bisect_left(prices, price)]
+
+        ## only the side the event was on can have a new best price / size, and only at or through its top
+        if price < best_price[1] if buy else price > best_price[0]:
+            continue
+        if prices:
+            best = prices[-1] if buy else prices[0]
+            size = totals[best]
+        else:
+            best, size = nan, 0
+        if size != best_size[buy] or best != best_price[buy] and best is not best_price[buy]:  # nan is nan
+            best_price[buy], best_size[buy] = best, size
+            at, best_prices, sizes = side_changes[buy]
+            at.append(k)
+            best_prices.append(best)
+            sizes.append(size)
+
+    bbo = {'time': events['time'], 'ticker': tickers, 'bb': np.full(n, nan), 'bo': np.full(n, nan),
+           'bb_size': np.zeros(n, dtype=np.int64), 'bo_size': np.zeros(n, dtype=np.int64)}
+    for (tk, buy), (at, best_prices, sizes) in changes.items():
+        ## the ticker's events take the last change at or before them (the first is its state at k = -1)
+        mine = np.nonzero(tickers == tk)[0]
+        idx = np.searchsorted(at, mine, side='right') - 1
+        prefix = 'bb' if buy else 'bo'
+        bbo[prefix][mine] = np.asarray(best_prices)[idx]
+        bbo[prefix + '_size'][mine] = np.asarray(sizes, dtype=np.int64)[idx]
+    return bbo, books
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="replay a competitor book.log order by order")
+    parser.add_argument('log')
+    parser.add_argument('--out', help="write the per-event BBO arrays here (.npz)")
+    args = parser.parse_args()
+
+    events = read_events(args.log)
+    start = time.perf_counter()
+    bbo, books = replay(events)
+    elapsed = time.perf_counter() - start
+    print("%d events in %.2fs (%.0f/s), %s orders left" % (
+        len(events), elapsed, len(events) / max(elapsed, 1e-9),
+        ', '.join('%d: %d' % (ticker, len(book)) for ticker, book in sorted(books.items()))))
+    if args.out:
+        np.savez(args.out, **bbo)
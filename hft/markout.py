@@ -0,0 +1,283 @@
+"""Fill markouts: how the mid moved after each of our fills.
+
+For a fill of side s (+1 buy, -1 sell) at price p, with mid m0 as of the
+fill and m_h as of h later (all per share):
+
+    edge         s * (m0 - p)     spread captured against the mid at the fill
+    markout_h    s * (m_h - p)    what the fill is worth h later (realized spread)
+    adverse_h    s * (m0 - m_h)   how far the mid ran against us, edge - markout_h
+
+markouts() joins every fill to the mid series with one searchsorted over
+(ticker, time) keys, so a million fills cost a few array passes, and
+summarize() aggregates them per ticker, quantity weighted.
+
+Loaders turn the two kinds of fills into arrays: betabot4's trades.pkl /
+trades.jsonl (matched to us through buy_order_id / sell_order_id) with mids
+from a tradersbot message log, and the C++ bot's trades.log / book.log
+through booklog (matched through the resting / aggressing order ids).
+"""
+import ast
+import datetime
+import json
+import pickle
+import re
+
+import numpy as np
+
+SECONDS = (1, 5, 30)  # default horizons, in seconds
+
+_FRACTION = re.compile(r'(\.\d{6})\d+')
+
+
+def _epoch(stamp):
+    ## exchange ISO timestamps ('2019-11-10T08:48:27.9603377-05:00') to epoch seconds
+    return datetime.datetime.fromisoformat(_FRACTION.sub(r'\1', stamp)).timestamp()
+
+
+def _ids(tickers, names=None):
+    ## ticker labels to dense ids, names extended with any new ones
+    names = list(names or [])
+    index = {name: i for i, name in enumerate(names)}
+    ids = np.empty(len(tickers), dtype=int)
+    for k, ticker in enumerate(tickers):
+        if ticker not in index:
+            index[ticker] = len(names)
+            names.append(ticker)
+        ids[k] = index[ticker]
+    return ids, names
+
+
+def markouts(fills, quotes, horizons):
+    """Edge, markouts and adverse selection of every fill.
+
+    fills: dict of equal length arrays time, ticker (int id), price, side
+    (+1 / -1). quotes: dict of arrays time, ticker, mid, any order. horizons
+    are in the same unit as the times. m0 is the last mid before the fill,
+    m_h the last at or before fill time + h. Fills with no mid before them,
+    or past the last mid at a horizon, get nan there. Returns a dict of
+    arrays: m0, edge, and markout_<h> / adverse_<h> per horizon.
+    """
+    q_time = np.asarray(quotes['time'])
+    q_ticker = np.asarray(quotes['ticker'], dtype=np.int64)
+    q_mid = np.asarray(quotes['mid'], dtype=float)
+    f_time = np.asarray(fills['time'])
+    f_ticker = np.asarray(fills['ticker'], dtype=np.int64)
+    side = np.asarray(fills['side'], dtype=float)
+    price = np.asarray(fills['price'], dtype=float)
+
+    ## one sorted key over (ticker, time): ticker * span + time since the start
+    start = min(q_time.min(), f_time.min()) if len(q_time) and len(f_time) else 0
+    span = (max(q_time.max(), f_time.max()) - start + max(horizons) + 1) if len(q_time) and len(f_time) else 1
+    order = np.lexsort((q_time, q_ticker))
+    q_time, q_ticker, q_mid = q_time[order], q_ticker[order], q_mid[order]
+    q_key = q_ticker * span + (q_time - start)
+    last = np.searchsorted(q_ticker, f_ticker, side='right') - 1  # last quote of the fill's ticker
+    last_time = q_time[last] if len(q_time) else np.zeros(len(f_time))
+
+    def mid_at(times, side='right'):
+        idx = np.searchsorted(q_key, f_ticker * span + (times - start), side=side) - 1
+        at = np.clip(idx, 0, None)
+        ok = (idx >= 0) & (q_ticker[at] == f_ticker)
+        return np.where(ok, q_mid[at], np.nan)
+
+    m0 = mid_at(f_time, 'left')  # strictly before the fill, a quote stamped with it may already show it
+    result = {'m0': m0, 'edge': side * (m0 - price)}
+    for h in horizons:
+        m_h = mid_at(f_time + h)
+        m_h = np.where(f_time + h <= last_time, m_h, np.nan)  # nothing after the last quote to mark against
+        result['markout_%s' % h] = side * (m_h - price)
+        result['adverse_%s' % h] = side * (m0 - m_h)
+    return result
+
+
+def summarize(fills, marks, tickers=None):
+    """Quantity weighted means of every markout column per ticker.
+
+    fills needs ticker (int ids, names in `tickers`) and quantity; nan marks
+    are left out of their column's average. Returns a list of row dicts.
+    """
+    ticker = np.asarray(fills['ticker'], dtype=int)
+    quantity = np.asarray(fills['quantity'], dtype=float)
+    n_tickers = ticker.max() + 1 if len(ticker) else 0
+
+    count = np.bincount(ticker, minlength=n_tickers)
+    volume = np.bincount(ticker, weights=quantity, minlength=n_tickers)
+    means = {}
+    for name, values in marks.items():
+        if name == 'm0':
+            continue
+        ok = ~np.isnan(values)
+        weight = np.bincount(ticker[ok], weights=quantity[ok], minlength=n_tickers)
+        total = np.bincount(ticker[ok], weights=(values * quantity)[ok], minlength=n_tickers)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means[name] = total / weight
+
+    rows = []
+    for k in np.nonzero(count)[0]:
+        row = {'ticker': tickers[k] if tickers else int(k), 'fills': int(count[k]), 'volume': float(volume[k])}
+        row.update({name: float(column[k]) for name, column in means.items()})
+        rows.append(row)
+    return rows
+
+
+## ox: trades.pkl / trades.jsonl and a tradersbot message log
+
+def load_trades(path):
+    ## trade dicts from trades.pkl (one pickled list) or trades.jsonl (one per line)
+    if path.endswith('.pkl'):
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def read_messages(path):
+    ## messages of a msglog.txt (str(msg) per line) or msglog.jsonl
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line) if line.startswith('{"') else ast.literal_eval(line)
+
+
+def our_order_ids(messages):
+    ## ids the exchange acked for us (ACK MODIFY ORDERS) or listed as our open orders
+    ids = set()
+    for msg in messages:
+        if msg.get('message_type') == 'ACK MODIFY ORDERS':
+            ids.update(int(o['order_id']) for o in msg.get('orders', []) if o.get('order_id') is not None)
+        elif 'trader_state' in msg:
+            ids.update(int(order_id) for order_id in msg['trader_state'].get('open_orders', {}))
+    return ids
+
+
+def quotes_from_messages(messages, tickers=None):
+    ## mid of every two-sided MARKET UPDATE, times in epoch seconds
+    times, names, mids = [], [], []
+    for msg in messages:
+        if msg.get('message_type') != 'MARKET UPDATE':
+            continue
+        state = msg['market_state']
+        if not state['bids'] or not state['asks'] or 'time' not in state:
+            continue
+        bid = max(float(p) for p in state['bids'])
+        ask = min(float(p) for p in state['asks'])
+        times.append(_epoch(state['time']))
+        names.append(state['ticker'])
+        mids.append((bid + ask) / 2)
+    ticker, tickers = _ids(names, tickers)
+    return {'time': np.array(times), 'ticker': ticker, 'mid': np.array(mids)}, tickers
+
+
+def fills_from_trades(trades, our_ids, tickers=None):
+    """Our side of each trade: a trade is ours through buy_order_id /
+    sell_order_id being in our_ids (see our_order_ids), self trades dropped.
+    The `buy` flag is the aggressor's side, not ours, so it can't stand in."""
+    buy_id = np.array([int(t.get('buy_order_id') or 0) for t in trades], dtype=np.uint64)
+    sell_id = np.array([int(t.get('sell_order_id') or 0) for t in trades], dtype=np.uint64)
+    ours = np.array(sorted(our_ids), dtype=np.uint64)
+    bought, sold = np.isin(buy_id, ours), np.isin(sell_id, ours)
+    side = bought.astype(int) - sold.astype(int)  # 0: not ours, or a self trade
+    keep = np.nonzero(side)[0]
+    ticker, tickers = _ids([trades[k]['ticker'] for k in keep], tickers)
+    return {
+        'time': np.array([_epoch(trades[k]['time']) for k in keep]),
+        'ticker': ticker,
+        'price': np.array([float(trades[k]['price']) for k in keep]),
+        'quantity': np.array([float(trades[k]['quantity']) for k in keep]),
+        'side': side[keep],
+    }, tickers
+
+
+def ox_markouts(trades_path, msglog_path, horizons=SECONDS):
+    """Markout summary rows of a betabot trades file against its message log
+    (which also supplies our order ids)."""
+    messages = list(read_messages(msglog_path))
+    quotes, tickers = quotes_from_messages(messages)
+    fills, tickers = fills_from_trades(load_trades(trades_path), our_order_ids(messages), tickers)
+    return summarize(fills, markouts(fills, quotes, horizons), tickers)
+
+
+## hft: trades.log / book.log through booklog
+
+def fills_from_booklog(log, our_ids=None):
+    """Our side of each trade in a booklog.BookLog. The trade's buy flag is
+    the aggressor's side; a resting order of ours traded the other way.
+
+    Which order is ours comes from our_ids if given, else from the
+    resting_ours / aggressing_ours columns trades.log now writes. A log
+    without them (older trades.log, book.log's TRADE lines) needs our_ids:
+    a trade can hit our resting order as well as be one we sent, so
+    neither column alone says which side we were on."""
+    trades = log.trades
+    aggressor = np.where(trades['buy'], 1, -1)
+    if our_ids is not None:
+        ours = np.array(sorted(our_ids), dtype=np.uint64)
+        aggressing = np.isin(trades['aggressing_order_id'], ours)
+        resting = np.isin(trades['resting_order_id'], ours)
+    elif len(trades) and (trades['resting_ours'] < 0).any():
+        raise ValueError("log has trades without the resting_ours / aggressing_ours columns, pass our_ids")
+    else:
+        aggressing, resting = trades['aggressing_ours'] > 0, trades['resting_ours'] > 0
+    side = np.where(aggressing & ~resting, aggressor, np.where(resting & ~aggressing, -aggressor, 0))
+    keep = side != 0
+    return {
+        'time': np.asarray(trades['time'][keep]), 'ticker': np.asarray(trades['ticker'][keep], dtype=int),
+        'price': np.asarray(trades['price'][keep]), 'quantity': np.asarray(trades['quantity'][keep], dtype=float),
+        'side': side[keep],
+    }
+
+
+def quotes_from_booklog(log, column='swmid', ticker=0):
+    ## mid (or swmid, the notebooks' size weighted mid) of every snapshot, times in ns
+    bbo = log.bbo()
+    mid = (bbo['bb'] + bbo['bo']) / 2 if column == 'mid' else bbo[column]
+    ok = ~np.isnan(mid)
+    return {'time': np.asarray(bbo['time'][ok]), 'ticker': np.full(ok.sum(), ticker), 'mid': mid[ok]}
+
+
+def hft_markouts(fills_log, book_log=None, our_ids=None, horizons=SECONDS, column='swmid'):
+    """Markout summary rows of the C++ bot's fills. fills_log / book_log are
+    booklog.BookLog objects (book_log defaults to fills_log, as book.log has
+    both); horizons are in seconds and the logs in steady_clock ns. our_ids
+    is as for fills_from_booklog."""
+    book_log = book_log if book_log is not None else fills_log
+    fills = fills_from_booklog(fills_log, our_ids)
+    quotes = quotes_from_booklog(book_log, column, ticker=int(fills['ticker'][0]) if len(fills['ticker']) else 0)
+    marks = markouts(fills, quotes, [int(h * 1e9) for h in horizons])
+    ## report the columns in seconds, as asked for
+    marks = {re.sub(r'_(\d+)$', lambda m: '_%gs' % (int(m.group(1)) / 1e9), name): v for name, v in marks.items()}
+    return summarize(fills, marks)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="fill markouts per ticker")
+    sub = parser.add_subparsers(dest='kind')
+    ox = sub.add_parser('ox', help="betabot trades.pkl / trades.jsonl against its msglog")
+    ox.add_argument('trades')
+    ox.add_argument('msglog')
+    hft = sub.add_parser('hft', help="C++ bot trades.log against book.log")
+    hft.add_argument('trades_log')
+    hft.add_argument('book_log')
+    hft.add_argument('--our-ids', help="file of our order ids, one per line, for a trades.log without the ours columns")
+    parser.add_argument('--horizons', default='1,5,30', help="seconds, comma separated")
+    args = parser.parse_args()
+
+    horizons = [float(h) if '.' in h else int(h) for h in args.horizons.split(',')]
+    if args.kind == 'ox':
+        rows = ox_markouts(args.trades, args.msglog, horizons)
+    else:
+        import tempfile
+
+        import booklog
+        fills_log = booklog.parse(args.trades_log, tempfile.mkdtemp(prefix='trades'))
+        book_log = booklog.parse(args.book_log, tempfile.mkdtemp(prefix='book'))
+        our_ids = None
+        if args.our_ids:
+            with open(args.our_ids) as f:
+                our_ids = {int(line) for line in f if line.strip()}
+        rows = hft_markouts(fills_log, book_log, our_ids=our_ids, horizons=horizons)
+    for row in rows:
+        print(json.dumps(row))
@@ -0,0 +1,5 @@
+import os
+import sys
+
+## the hft scripts import each other as top level modules (import booklog)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
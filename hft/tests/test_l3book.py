@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+import l3book
+
+## a TRADE's buy flag is the aggressor's side; the fill comes off the resting order (second to last id)
+LOG = """\
+ORDER, 1,0,99.98,100,1,1
+ORDER, 2,0,99.99,200,1,2
+ORDER, 3,0,99.99,300,1,3
+ORDER BOOK,3,BID,99.99,200,2
+ORDER, 4,0,100.02,100,0,4
+
+CANCEL, 5,0,2
+TRADE, 6,0,99.99,100,0,3,9
+TRADE, 7,0,99.99,200,0,3,10,0,1
+CANCEL, 8,0,77
+"""
+
+
+@pytest.fixture
+def events(tmp_path):
+    path = tmp_path / 'book.log'
+    path.write_text(LOG)
+    return l3book.read_events(str(path))
+
+
+def test_read_events(events):
+    assert len(events) == 8
+    assert list(events['kind']) == [l3book.ORDER] * 4 + [l3book.CANCEL, l3book.TRADE, l3book.TRADE, l3book.CANCEL]
+    assert list(events['order_id']) == [1, 2, 3, 4, 2, 3, 3, 77]
+    assert list(events['quantity'][5:7]) == [100, 200]
+
+
+def test_replay_bbo(events):
+    bbo, books = l3book.replay(events)
+    np.testing.assert_array_equal(bbo['bb'], [99.98, 99.99, 99.99, 99.99, 99.99, 99.99, 99.98, 99.98])
+    np.testing.assert_array_equal(bbo['bb_size'], [100, 200, 500, 500, 300, 200, 100, 100])
+    np.testing.assert_array_equal(bbo['bo'][3:], [100.02] * 5)
+    assert np.isnan(bbo['bo'][:3]).all() and (bbo['bo_size'][:3] == 0).all()
+
+    book = books[0]
+    assert len(book) == 2 and 3 not in book
+    assert book.depth(True) == [(99.98, 100, 1)]
+    assert book.spread() == pytest.approx(0.04)
+
+
+def test_replay_in_chunks_matches(events):
+    whole, _ = l3book.replay(events)
+    first, books = l3book.replay(events[:5])
+    second, _ = l3book.replay(events[5:], books)
+    for name in ('bb', 'bo', 'bb_size', 'bo_size'):
+        np.testing.assert_array_equal(np.concatenate([first[name], second[name]]), whole[name])
+
+
+def test_book_queue():
+    book = l3book.L3Book()
+    book.insert(1, True, 99.98, 100)
+    book.insert(2, True, 99.99, 200)
+    book.insert(3, True, 99.99, 300)
+    book.insert(4, False, 100.02, 100)
+    assert book.get_bbo(True) == 99.99 and book.quote_size(True) == 500
+    assert book.queue_position(3) == (1, 200)
+    assert book.quantity_ahead(1) == 500
+    assert book.level(True, 99.99) == (500, 2)
+
+    assert book.decrease_qty(2, 50) == 150
+    assert book.queue_position(3) == (1, 150)  # a partial fill keeps its place
+    assert book.decrease_qty(2, 150) == 0
+    assert book.queue_position(3) == (0, 0)
+    assert book.decrease_qty(2, 1) == -1
+
+    assert book.cancel(3)
+    assert not book.cancel(3)
+    assert book.get_bbo(True) == 99.98
+    assert book.mid_price() == pytest.approx(100.0)
+    assert book.cancel(4)
+    assert np.isnan(book.get_bbo(False)) and book.quote_size(False) == 0
+    assert book.mid_price(default_to=-1) == -1
@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+import booklog
+import markout
+
+S = 10 ** 9  # the logs are in ns
+
+## mid 100.00 until 1s after the fills, then 100.10
+LOG = """\
+ORDER BOOK,1000,OFFER,100.02,100,11
+ORDER BOOK,1000,BID,99.98,100,12
+TRADE, 2000,0,100.02,100,1,11,21,0,1
+TRADE, 2500,0,99.98,100,0,12,22,1,0
+TRADE, 2600,0,100.02,50,1,13,23,1,0
+ORDER BOOK,1000002000,OFFER,100.12,100,14
+ORDER BOOK,1000002000,BID,100.08,100,15
+ORDER BOOK,3000000000,OFFER,100.12,100,14
+ORDER BOOK,3000000000,BID,100.08,100,15
+"""
+
+
+@pytest.fixture
+def log(tmp_path):
+    path = tmp_path / 'trades.log'
+    path.write_text(LOG)
+    return booklog.parse(str(path), str(tmp_path / 'npy'))
+
+
+def test_sides_from_our_columns(log):
+    fills = markout.fills_from_booklog(log)
+    ## we lift the offer (aggressive buy), get hit on our bid (passive buy), get lifted on our offer (passive sell)
+    np.testing.assert_array_equal(fills['side'], [1, 1, -1])
+    np.testing.assert_array_equal(fills['price'], [100.02, 99.98, 100.02])
+
+
+def test_our_ids_override_columns(log):
+    fills = markout.fills_from_booklog(log, our_ids={12})
+    np.testing.assert_array_equal(fills['side'], [1])
+    np.testing.assert_array_equal(fills['time'], [2500])
+
+
+def test_old_log_needs_our_ids(tmp_path):
+    path = tmp_path / 'book.log'
+    path.write_text('\n'.join(line.rsplit(',', 2)[0] if line.startswith('TRADE') else line
+                              for line in LOG.splitlines()) + '\n')
+    log = booklog.parse(str(path), str(tmp_path / 'npy'))
+    with pytest.raises(ValueError):
+        markout.fills_from_booklog(log)
+    np.testing.assert_array_equal(markout.fills_from_booklog(log, our_ids={21, 12})['side'], [1, 1])
+
+
+def test_markout_signs_passive_and_aggressive(log):
+    fills = markout.fills_from_booklog(log)
+    quotes = markout.quotes_from_booklog(log, column='mid')
+    marks = markout.markouts(fills, quotes, [S])
+    ## paid the spread buying aggressively, earned it on both passive fills
+    np.testing.assert_allclose(marks['edge'], [-0.02, 0.02, 0.02])
+    ## mid went up 0.10: good for both buys, bad for the sell
+    np.testing.assert_allclose(marks['markout_%d' % S], [0.08, 0.12, -0.08])
+    np.testing.assert_allclose(marks['adverse_%d' % S], [-0.10, -0.10, 0.10])
+
+
+def test_markout_past_last_quote_is_nan():
+    fills = {'time': np.array([5.0]), 'ticker': np.array([0]), 'price': np.array([10.0]), 'side': np.array([-1])}
+    quotes = {'time': np.array([0.0, 6.0]), 'ticker': np.array([0, 0]), 'mid': np.array([10.5, 9.0])}
+    marks = markout.markouts(fills, quotes, [1, 5])
+    assert marks['edge'][0] == pytest.approx(-0.5)
+    assert marks['markout_1'][0] == pytest.approx(1.0)
+    assert np.isnan(marks['markout_5'][0])
+
+
+def test_fills_from_trades_by_order_id():
+    stamp = '2019-11-10T08:48:27.9603377-05:00'
+    trades = [
+        {'ticker': 'TRDRS1', 'price': 10.0, 'quantity': 5, 'buy': True, 'buy_order_id': 1, 'sell_order_id': 9, 'time': stamp},
+        {'ticker': 'TRDRS1', 'price': 10.1, 'quantity': 5, 'buy': True, 'buy_order_id': 8, 'sell_order_id': 2, 'time': stamp},
+        {'ticker': 'TRDRS2', 'price': 20.0, 'quantity': 5, 'buy': False, 'buy_order_id': 7, 'sell_order_id': 6, 'time': stamp},
+    ]
+    fills, tickers = markout.fills_from_trades(trades, our_ids={1, 2})
+    ## the second trade's buy flag says the aggressor bought, but our order 2 was the sell
+    np.testing.assert_array_equal(fills['side'], [1, -1])
+    assert tickers == ['TRDRS1']
+
+
+def test_summarize_per_ticker():
+    fills = {'ticker': np.array([1, 0, 1]), 'quantity': np.array([100, 50, 300])}
+    marks = {'m0': np.zeros(3), 'edge': np.array([0.02, -0.01, np.nan]), 'markout_1': np.array([0.04, 0.0, 0.08])}
+    rows = markout.summarize(fills, marks, tickers=['A', 'B'])
+    assert [row['ticker'] for row in rows] == ['A', 'B']
+    assert rows[1]['fills'] == 2 and rows[1]['volume'] == 400
+    assert rows[1]['edge'] == pytest.approx(0.02)  # the nan fill left out
+    assert rows[1]['markout_1'] == pytest.approx((0.04 * 100 + 0.08 * 300) / 400)
@@ -0,0 +1,8 @@
+## shared building blocks for the ox bots (import from the ox directory)
+## the tools with a command line (replay, sweep, tickstore, aioclient, bench) are left out so python -m core.<tool> runs cleanly
+
+from core.correlation import StreamingCorrelation
+from core.history import PriceHistory
+from core.reliability import ReliabilityTracker
+from core.engine import StrategyEngine
+from core.orders import OrderBatch
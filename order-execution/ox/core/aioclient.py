@@ -0,0 +1,240 @@
+import asyncio
+import json
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import websockets
+except ImportError:  # only needed to actually connect / serve
+    websockets = None
+
+from core.orders import OrderBatch
+from core import recorder
+from core.replay import ReplayExchange
+
+PORT = 10914
+CALLBACKS = dict(recorder.CALLBACKS, PING='onPing')
+
+
+def _require_websockets():
+    if websockets is None:
+        raise ImportError("core.aioclient needs the websockets package (pip install websockets)")
+
+
+class AsyncTradersBot(object):
+    """asyncio take on tradersbot.TradersBot, same constructor and callbacks.
+
+    Set onAckRegister / onMarketUpdate / onTraderUpdate / onNews / onTrade /
+    onAckModifyOrders (or StrategyEngine.attach) and call run(), exactly as
+    with TradersBot. Three tasks share the connection: the reader decodes
+    frames as they arrive, the strategy task runs the callbacks, and the
+    writer sends each callback's orders as one MODIFY ORDERS message.
+
+    A MARKET UPDATE for a ticker that is still waiting to be handled replaces
+    the waiting one, so however long a callback runs, the backlog is at most
+    one book per ticker (counted in `coalesced`). The callbacks run one at a
+    time on a worker thread, so the reader keeps draining the socket while
+    a slow one runs; threaded=False runs them inline on the event loop
+    (handy for debugging, but then a slow callback stalls decoding too).
+    """
+
+    def __init__(self, host, id, password, token=None, port=PORT, threaded=True):
+        self.host = host
+        self.id = id
+        self.password = password
+        self.token = token
+        self.port = port
+        self.threaded = threaded
+
+        self.onAckRegister = None
+        self.onMarketUpdate = None
+        self.onTraderUpdate = None
+        self.onNews = None
+        self.onTrade = None
+        self.onAckModifyOrders = None
+        self.onPing = None
+
+        self.received = 0
+        self.handled = 0
+        self.coalesced = 0  # market updates replaced before the strategy got to them
+        self.sent = 0
+
+        self._inbox = None
+        self._outbox = None
+        self._latest = {}  # ticker -> newest MARKET UPDATE not handled yet
+
+    @property
+    def url(self):
+        return 'ws://%s:%d/%s/%s' % (self.host, self.port, self.id, self.password)
+
+    def _register_message(self):
+        msg = {'message_type': 'REGISTER', 'sub_all_trades': False}
+        if self.token is not None:
+            msg['token'] = self.token
+        return msg
+
+    async def _reader(self, ws):
+        try:
+            async for raw in ws:
+                self.received += 1
+                msg = json.loads(raw)
+                if msg.get('message_type') == 'MARKET UPDATE':
+                    ticker = msg['market_state']['ticker']
+                    if ticker in self._latest:
+                        self.coalesced += 1
+                    else:
+                        self._inbox.put_nowait(ticker)  # resolved to the newest update when handled
+                    self._latest[ticker] = msg
+                else:
+                    self._inbox.put_nowait(msg)
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            self._inbox.put_nowait(None)
+
+    def _handle(self, callback, msg):
+        order = OrderBatch()
+        try:
+            callback(msg, order)
+        except Exception:
+            ## same as TradersBot: report it, lose the orders, keep going
+            traceback.print_exc()
+            return None
+        return order
+
+    async def _strategy(self):
+        loop = asyncio.get_event_loop()
+        executor = ThreadPoolExecutor(max_workers=1) if self.threaded else None
+        try:
+            while True:
+                item = await self._inbox.get()
+                if item is None:
+                    break
+                msg = self._latest.pop(item) if isinstance(item, str) else item
+
+                callback = getattr(self, CALLBACKS.get(msg.get('message_type'), ''), None)
+                if callback is None:
+                    continue
+                if executor is not None:
+                    order = await loop.run_in_executor(executor, self._handle, callback, msg)
+                else:
+                    order = self._handle(callback, msg)
+                    await asyncio.sleep(0)  # let the reader catch up between callbacks
+                self.handled += 1
+
+                if order is not None and len(order):
+                    self._outbox.put_nowait(order.to_message())
+        finally:
+            if executor is not None:
+                executor.shutdown()
+            self._outbox.put_nowait(None)
+
+    async def _writer(self, ws):
+        while True:
+            msg = await self._outbox.get()
+            if msg is None:
+                break
+            try:
+                await ws.send(json.dumps(msg))
+            except websockets.ConnectionClosed:
+                break
+            self.sent += 1
+
+    async def run_async(self):
+        _require_websockets()
+        self._inbox = asyncio.Queue()
+        self._outbox = asyncio.Queue()
+        async with websockets.connect(self.url, max_size=None) as ws:
+            await ws.send(json.dumps(self._register_message()))
+            await asyncio.gather(self._reader(ws), self._strategy(), self._writer(ws))
+
+    def run(self):
+        asyncio.run(self.run_async())
+
+
+class _SocketExchange(ReplayExchange):
+    ## a ReplayExchange whose messages go out over a websocket instead of to callbacks
+
+    def __init__(self, *args, **kwargs):
+        ReplayExchange.__init__(self, *args, **kwargs)
+        self.outbox = []
+
+    def _dispatch(self, callback, msg):
+        self.outbox.append(msg)
+
+    async def flush(self, ws):
+        outbox, self.outbox = self.outbox, []
+        for msg in outbox:
+            await ws.send(json.dumps(msg))
+
+
+async def serve_replay(case, host='127.0.0.1', port=PORT, variant=0, speedup=None, sessions=None, drain=0.1):
+    """Local WebSocket stand-in for the exchange, for AsyncTradersBot (or TradersBot).
+
+    Every connection gets its own replay of `case` (see core.replay) paced
+    at `speedup` case seconds per wall second (None: no waiting beyond
+    yielding to the client, which then trails the replay and has its orders
+    matched late). After the last second the session stays open until the
+    client has sent nothing for `drain` seconds (counted from that second), so orders it is still
+    working on are matched rather than dropped. The results of finished
+    sessions are appended to `sessions` if given. Returns the websockets
+    server.
+    """
+    _require_websockets()
+
+    async def handler(ws, path=None):
+        exchange = _SocketExchange(case, variant=variant, speedup=speedup)
+        await ws.recv()  # REGISTER
+        loop = asyncio.get_event_loop()
+        last_heard = [loop.time()]
+
+        async def receive():
+            async for raw in ws:
+                last_heard[0] = loop.time()
+                msg = json.loads(raw)
+                if msg.get('message_type') == 'MODIFY ORDERS':
+                    exchange._process(OrderBatch.from_message(msg))
+
+        receiver = asyncio.ensure_future(receive())
+        try:
+            exchange.start()
+            await exchange.flush(ws)
+            for t in range(exchange.case_length + 1):
+                exchange.step(t)
+                await exchange.flush(ws)
+                await asyncio.sleep(1.0 / speedup if speedup else 0)
+            ## the client may still be working through the last updates: wait for it to go quiet
+            last_heard[0] = loop.time()
+            while loop.time() - last_heard[0] < drain:
+                await asyncio.sleep(drain - (loop.time() - last_heard[0]))
+        finally:
+            receiver.cancel()
+        if sessions is not None:
+            sessions.append(exchange.results())
+        await ws.close()
+
+    return await websockets.serve(handler, host, port, max_size=None)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="serve a supp_*.json case as a local exchange stand-in")
+    parser.add_argument('case')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--variant', type=int, default=0)
+    parser.add_argument('--speedup', type=float, default=1.0)
+    args = parser.parse_args()
+
+    async def main():
+        sessions = []
+        server = await serve_replay(args.case, args.host, args.port, args.variant, args.speedup, sessions)
+        print("serving %s on ws://%s:%d" % (args.case, args.host, args.port))
+        async with server:
+            while True:
+                await asyncio.sleep(1)
+                while sessions:
+                    print(json.dumps(sessions.pop(0)))
+
+    asyncio.run(main())
@@ -0,0 +1,227 @@
+import copy
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from core.instrument import Histogram
+from core.orders import OrderBatch
+from core.recorder import CALLBACKS, read_events
+from core.replay import ReplayExchange, exec_bot, load_case
+
+BOTS = ('finalbot.py', 'betabot.py', 'betabot2.py', 'betabot3.py', 'betabot4.py', 'naive.py', 'naive2.py')
+
+
+class LogPlayer(object):
+    """Stands in for tradersbot.TradersBot and feeds a recorded session to the
+    bot's callbacks, each with a fresh OrderBatch that goes nowhere.
+
+    Like TradersBot, an exception in a callback is counted, not raised.
+    """
+
+    def __init__(self, messages):
+        self.messages = messages
+        for attr in set(CALLBACKS.values()) | {'onPing'}:
+            setattr(self, attr, None)
+        self.latency = {}  # message_type -> Histogram of ns per callback
+        self.errors = 0
+        self.last_error = None
+
+    def run(self):
+        clock = time.perf_counter_ns
+        for msg in self.messages:
+            message_type = msg.get('message_type')
+            callback = getattr(self, CALLBACKS.get(message_type, ''), None)
+            if callback is None:
+                continue
+            start = clock()
+            try:
+                callback(msg, OrderBatch())
+            except Exception as e:
+                self.errors += 1
+                self.last_error = '%s: %s' % (type(e).__name__, e)
+            if message_type not in self.latency:
+                self.latency[message_type] = Histogram()
+            self.latency[message_type].record(clock() - start)
+
+
+class _TimedExchange(ReplayExchange):
+    ## ReplayExchange that also keeps a latency Histogram per message type
+
+    def __init__(self, *args, **kwargs):
+        ReplayExchange.__init__(self, *args, **kwargs)
+        self.latency = {}
+
+    def _dispatch(self, callback, msg):
+        n = len(self.latencies)
+        ReplayExchange._dispatch(self, callback, msg)
+        if len(self.latencies) > n:
+            message_type = msg['message_type']
+            if message_type not in self.latency:
+                self.latency[message_type] = Histogram()
+            self.latency[message_type].record(self.latencies[n] * 1e9)
+
+
+def scale_case(case, n_securities=None, case_length=None, seed=0):
+    """A copy of a supp_*.json case grown (or cut) to n_securities and case_length.
+
+    Extra seconds and extra tickers get price paths bootstrapped from the
+    returns of the original ones and copies of the original news, shifted
+    to the new time block / ticker, with each body keeping its original
+    error against the path. The news rate per ticker per second stays the
+    same, so the work per message grows the way a bigger session's would.
+    """
+    rng = np.random.RandomState(seed)
+    base = case['securities']
+    base_tickers = list(base)
+    base_length = case['meta']['case_length']
+    n_securities = n_securities or len(base_tickers)
+    case_length = case_length or base_length
+    n = case_length + 1
+
+    scaled = {'meta': dict(case['meta'], case_length=case_length), 'securities': {}, 'underlyings': {}, 'news': []}
+    prices = {}
+    for j in range(n_securities):
+        source = base_tickers[j % len(base_tickers)]
+        ticker = source if j < len(base_tickers) else 'TRDRS%d' % (j + 1)
+        path = base[source]['pricepath']
+        price = np.asarray(path['price'], dtype=float)
+        returns = np.diff(np.log(price))
+        if j < len(base_tickers):
+            head = price[:n]
+        else:
+            head = price[0] * np.exp(np.concatenate([[0], np.cumsum(rng.choice(returns, min(n, len(price)) - 1))]))
+        tail = head[-1] * np.exp(np.cumsum(rng.choice(returns, n - len(head))))
+        prices[ticker] = np.round(np.concatenate([head, tail]), 2)
+
+        spec = copy.deepcopy(base[source])
+        spec['ticker'] = ticker
+        spec['underlyings'] = {ticker: 1}
+        spec['pricepath'] = {key: (prices[ticker].tolist() if key == 'price' else
+                                   np.resize(np.asarray(values), n).tolist())
+                             for key, values in path.items()}
+        scaled['securities'][ticker] = spec
+        scaled['underlyings'][ticker] = dict(case['underlyings'].get(source, {'limit': 500}), name=ticker)
+
+    base_price = {tk: np.asarray(base[tk]['pricepath']['price'], dtype=float) for tk in base_tickers}
+    tickers = list(scaled['securities'])
+    base_ids = {ticker: k for k, ticker in enumerate(base_tickers)}
+    for block in range(0, case_length, base_length):
+        for group in range(0, n_securities, len(base_tickers)):
+            for news in case['news']:
+                source, target = news['headline'].split()
+                k = base_ids[source]
+                if group + k >= n_securities or block + news['time'] > case_length:
+                    continue
+                ticker = tickers[group + k]
+                target = int(target)
+                new_target = min(block + target, case_length)
+                error = np.asarray(news['body_list']) - base_price[source][min(target, base_length)]
+                scaled['news'].append(dict(
+                    news, time=block + news['time'], headline='%s %d' % (ticker, new_target),
+                    body_list=np.round(prices[ticker][new_target] + error, 2).tolist(),
+                ))
+    scaled['news'].sort(key=lambda news: news['time'])
+    return scaled
+
+
+def _summary(latency, messages, errors, last_error, cpu, wall):
+    total = Histogram()
+    for histogram in latency.values():
+        total.merge(histogram)
+    return {
+        'messages': messages, 'cpu_s': cpu, 'wall_s': wall, 'errors': errors, 'last_error': last_error,
+        'latency_us': total.summary(1e3),
+        'latency_us_by_type': {message_type: h.summary(1e3) for message_type, h in latency.items()},
+    }
+
+
+def bench_bot(bot, session, variant=0, params=None, memory=True, workdir=None):
+    """Benchmarks one bot script on one session and returns a dict of results.
+
+    session is a recorded message log path, a list of messages or a case
+    dict (replayed, orders matched). Timings come from a plain run; with
+    memory=True a second run under tracemalloc gives the peak traced
+    memory (tracemalloc slows everything down, so it is not timed).
+    """
+    if isinstance(session, str):
+        session = list(read_events(session))
+    workdir = workdir or tempfile.mkdtemp(prefix='bench')
+    players = []
+
+    def make_bot(*args, **kwargs):
+        if isinstance(session, dict):
+            player = _TimedExchange(session, variant=variant)
+        else:
+            player = LogPlayer(session)
+        players.append(player)
+        return player
+
+    cpu, wall = time.process_time(), time.perf_counter()
+    exec_bot(bot, make_bot, params, workdir)
+    cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+
+    player = players[0]
+    messages = sum(h.n for h in player.latency.values())
+    result = _summary(player.latency, messages, player.errors, player.last_error, cpu, wall)
+    result['bot'] = os.path.basename(bot)
+
+    if memory:
+        tracemalloc.start()
+        try:
+            exec_bot(bot, make_bot, params, workdir)
+            result['peak_mb'] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def format_row(name, result):
+    latency = result['latency_us']
+    return '%-12s %-16s %8d %8.2f %9.1f %9.1f %10.1f %8s %6d' % (
+        result['bot'], name, result['messages'], result['cpu_s'],
+        latency['p50'], latency['p99'], latency['max'],
+        '%.1f' % result['peak_mb'] if 'peak_mb' in result else '-', result['errors'])
+
+
+HEADER = '%-12s %-16s %8s %8s %9s %9s %10s %8s %6s' % (
+    'bot', 'session', 'msgs', 'cpu_s', 'p50_us', 'p99_us', 'max_us', 'peak_mb', 'errors')
+
+
+if __name__ == '__main__':
+    import argparse
+
+    here = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description="benchmark bot handlers on recorded sessions and replayed cases")
+    parser.add_argument('bots', nargs='*', default=[os.path.join(here, bot) for bot in BOTS])
+    parser.add_argument('--log', action='append', default=[], help="recorded session (msglog.txt / msglog.jsonl)")
+    parser.add_argument('--case', action='append', default=[], help="supp_*.json case to replay")
+    parser.add_argument('--scale', action='append', default=[], metavar='SECURITIESxSECONDS',
+                        help="also replay the first case grown to this size, e.g. 200x3600")
+    parser.add_argument('--variant', type=int, default=0)
+    parser.add_argument('--no-memory', action='store_true', help="skip the tracemalloc run")
+    parser.add_argument('--json', help="also write every result to this file (JSON lines)")
+    args = parser.parse_args()
+
+    sessions = [(os.path.basename(path), list(read_events(path))) for path in args.log]
+    cases = [(os.path.basename(path), load_case(path)) for path in args.case]
+    sessions += cases
+    for size in args.scale:
+        n_securities, case_length = map(int, size.lower().split('x'))
+        sessions.append((size, scale_case(cases[0][1], n_securities, case_length)))
+
+    print(HEADER)
+    out = open(args.json, 'a') if args.json else None
+    for bot in args.bots:
+        for name, session in sessions:
+            result = bench_bot(bot, session, args.variant, memory=not args.no_memory)
+            result['session'] = name
+            print(format_row(name, result))
+            if out is not None:
+                out.write(json.dumps(result) + '\n')
+                out.flush()
+    if out is not None:
+        out.close()
@@ -0,0 +1,79 @@
+import numpy as np
+
+
+class Book(object):
+    """A market_state parsed once into sorted price / size arrays.
+
+    Bids are sorted best (highest) first, asks best (lowest) first, prices
+    rounded to the security's precision (case_meta 'precision', 2 for the
+    TRDRS stocks), so best levels are index 0 and depth queries are slices.
+    A side with no orders is an empty array; its best price is nan.
+    """
+
+    __slots__ = ('ticker', 'last_price', 'bid_prices', 'bid_sizes', 'ask_prices', 'ask_sizes')
+
+    def __init__(self, market_state, precision=2):
+        self.ticker = market_state['ticker']
+        self.last_price = market_state['last_price']
+        self.bid_prices, self.bid_sizes = self._side(market_state['bids'], precision, descending=True)
+        self.ask_prices, self.ask_sizes = self._side(market_state['asks'], precision, descending=False)
+
+    @staticmethod
+    def _side(levels, precision, descending):
+        n = len(levels)
+        prices = np.fromiter(map(float, levels), float, n).round(precision)
+        sizes = np.fromiter(levels.values(), float, n)
+        order = prices.argsort()
+        if descending:
+            order = order[::-1]
+        return prices[order], sizes[order]
+
+    @property
+    def two_sided(self):
+        return len(self.bid_prices) > 0 and len(self.ask_prices) > 0
+
+    @property
+    def best_bid(self):
+        return self.bid_prices[0] if len(self.bid_prices) else np.nan
+
+    @property
+    def best_ask(self):
+        return self.ask_prices[0] if len(self.ask_prices) else np.nan
+
+    @property
+    def bid_size(self):
+        return self.bid_sizes[0] if len(self.bid_sizes) else np.nan
+
+    @property
+    def ask_size(self):
+        return self.ask_sizes[0] if len(self.ask_sizes) else np.nan
+
+    def mid(self):
+        return (self.best_bid + self.best_ask) / 2
+
+    def spread(self):
+        return self.best_ask - self.best_bid
+
+    def microprice(self):
+        ## mid weighted towards the side with less size (betabot4's price)
+        bid_size, ask_size = self.bid_size, self.ask_size
+        return (self.best_ask * bid_size + self.best_bid * ask_size) / (bid_size + ask_size)
+
+    def depth(self, n=1):
+        ## (bid_prices, bid_sizes, ask_prices, ask_sizes) of the best n levels
+        return self.bid_prices[:n], self.bid_sizes[:n], self.ask_prices[:n], self.ask_sizes[:n]
+
+    def cumulative(self, buy):
+        ## running size available to a buyer (asks) or a seller (bids), best level first
+        return np.cumsum(self.ask_sizes if buy else self.bid_sizes)
+
+    def size_through(self, price, buy):
+        ## shares a buy (sell) limit at `price` could take right now
+        if buy:
+            return self.ask_sizes[:np.searchsorted(self.ask_prices, price, side='right')].sum()
+        return self.bid_sizes[:np.searchsorted(-self.bid_prices, -price, side='right')].sum()
+
+    def imbalance(self, n=1):
+        ## (bid size - ask size) / total over the best n levels, in [-1, 1]
+        bid, ask = self.bid_sizes[:n].sum(), self.ask_sizes[:n].sum()
+        return (bid - ask) / (bid + ask) if bid + ask > 0 else 0.0
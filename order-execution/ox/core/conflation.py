@@ -0,0 +1,60 @@
+class MarketConflator(object):
+    """Groups MARKET UPDATEs into batches so the strategy runs once per batch.
+
+    The engine still folds every book into its arrays as it arrives (that is
+    cheap); only the on_market hook, which re-runs fairs, reliability and rho
+    over all securities, waits for the batch to close. A ticker updated twice
+    in one batch is listed once, its latest book is what the engine holds.
+
+    interval=None batches per packet: the batch closes once every security
+    has updated, or, when the previous second's packet was short, as soon as
+    an update with a later elapsed_time arrives; that update is not part of
+    it but opens the next batch (late() tells the engine to run the short
+    one before the new book lands). interval=x closes a batch with the
+    update that comes x case seconds or more after it started, interval=0
+    is the old one call per message.
+    """
+
+    __slots__ = ('n', 'interval', 'pending', 'start', 'updates', 'batches')
+
+    def __init__(self, n, interval=None):
+        self.n = n
+        self.interval = interval
+        self.pending = {}  # tickers updated in the open batch, in arrival order
+        self.start = None  # elapsed_time of the first update in the open batch
+
+        self.updates = 0
+        self.batches = 0
+
+    def __len__(self):
+        return len(self.pending)
+
+    def late(self, time):
+        ## True if an update stamped `time` belongs to the next packet, not the open one
+        return self.interval is None and bool(self.pending) and time > self.start
+
+    def add(self, security, time):
+        ## records one update, returns the tickers of the batch that closed (None while it stays open)
+        self.updates += 1
+        closed = self.take() if self.late(time) else None
+        if self.start is None:
+            self.start = time
+        self.pending[security] = None
+        if closed is None and self.ready(time):
+            closed = self.take()
+        return closed
+
+    def ready(self, time):
+        if not self.pending:
+            return False
+        if self.interval is None:
+            return len(self.pending) >= self.n or time > self.start
+        return time - self.start >= self.interval
+
+    def take(self):
+        ## closes the batch, returns the tickers it covered
+        securities = list(self.pending)
+        self.pending.clear()
+        self.start = None
+        self.batches += 1
+        return securities
@@ -0,0 +1,113 @@
+from collections import deque
+
+import numpy as np
+
+
+class StreamingCorrelation(object):
+    """Running means, stdevs and correlations over n securities.
+
+    Each update folds one observation into the means and the co-moment matrix
+    (Welford), so estimates cost O(n^2) per tick no matter how long the case
+    has been running.
+
+    returns  -- feed the difference between consecutive updates instead of
+                the raw values (what betabot's _estimate_rho uses)
+    halflife -- if set, weight observations exponentially (in ticks)
+    window   -- if set, only keep the last `window` observations
+    """
+
+    def __init__(self, n, returns=False, halflife=None, window=None):
+        if halflife is not None and window is not None:
+            raise ValueError("use either halflife or window, not both")
+
+        self.n = n
+        self.returns = returns
+        self.alpha = None if halflife is None else 1 - 0.5 ** (1.0 / halflife)
+        self.window = window
+
+        self.count = 0
+        self.mean = np.zeros(n)
+        self._comoment = np.zeros((n, n))
+        self._last = None
+        self._kept = deque() if window is not None else None
+
+    def update(self, x):
+        x = np.asarray(x, dtype=float)
+        if self.returns:
+            last, self._last = self._last, x.copy()
+            if last is None:
+                return
+            x = x - last
+
+        if self.alpha is not None:
+            self._update_ewm(x)
+            return
+
+        if self._kept is not None:
+            if len(self._kept) == self.window:
+                self._remove(self._kept.popleft())
+            self._kept.append(x)
+
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self._comoment += np.outer(delta, x - self.mean)
+
+    def prime(self, count, mean, cov):
+        ## starts from `count` pseudo observations with this mean / covariance (a prior, see core/priors.py)
+        if self._kept is not None:
+            raise ValueError("a windowed StreamingCorrelation cannot be primed")
+        self.count = count
+        self.mean[:] = mean
+        self._comoment[:, :] = cov if self.alpha is not None else np.asarray(cov) * count
+
+    def _update_ewm(self, x):
+        self.count += 1
+        if self.count == 1:
+            self.mean[:] = x
+            return
+        delta = x - self.mean
+        self.mean += self.alpha * delta
+        self._comoment *= 1 - self.alpha
+        self._comoment += (self.alpha * (1 - self.alpha)) * np.outer(delta, delta)
+
+    def _remove(self, x):
+        ## inverse welford step for the observation leaving the window
+        if self.count == 1:
+            self.count = 0
+            self.mean[:] = 0
+            self._comoment[:, :] = 0
+            return
+        old_mean = self.mean.copy()
+        self.count -= 1
+        self.mean -= (x - old_mean) / self.count
+        self._comoment -= np.outer(x - self.mean, x - old_mean)
+
+    def cov(self):
+        ## population covariance (ddof=0, same as np.std)
+        if self.count == 0:
+            return np.full((self.n, self.n), np.nan)
+        if self.alpha is not None:
+            return self._comoment.copy()
+        return self._comoment / self.count
+
+    def std(self):
+        return np.sqrt(np.maximum(np.diag(self.cov()), 0))
+
+    def corr(self):
+        cov = self.cov()
+        std = np.sqrt(np.maximum(np.diag(cov), 0))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = cov / np.outer(std, std)
+        np.clip(corr, -1, 1, out=corr)
+        return corr
+
+    def rho(self):
+        ## median pairwise correlation (diagonal included, like np.median(np.corrcoef(...)))
+        if self.count < 2:
+            return np.nan
+        return np.median(self.corr().reshape(-1))
+
+    def estimate(self):
+        ## (rho, mus, stdevs) in the form betabot's _estimate_rho returns them
+        return self.rho(), self.mean.copy(), self.std()
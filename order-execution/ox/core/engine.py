@@ -0,0 +1,331 @@
+import atexit
+import pickle
+
+import numpy as np
+
+from core.book import Book
+from core.conflation import MarketConflator
+from core.correlation import StreamingCorrelation
+from core.factor import FactorModel
+from core.history import PriceHistory
+from core.order_state import OrderState
+from core.predictions import PredictionStore
+from core.priors import PriorCache
+from core.recorder import EventRecorder
+from core.registry import TickerRegistry
+from core.reliability import ReliabilityTracker
+
+
+class StrategyEngine(object):
+    """Bookkeeping shared by every ox bot.
+
+    The engine owns the tradersbot handlers, keeps per-security state in numpy
+    arrays indexed by dense ticker id (`registry`, built from case_meta at
+    registration; `securities` and `index` are its id -> ticker list and
+    ticker -> id dict) and hands control to the
+    strategy through hooks after each message has been folded in:
+
+        on_register(engine, order)
+        on_market(engine, security, order)      after a MARKET UPDATE
+        on_trader(engine, order)                after a TRADER UPDATE
+        on_news(engine, security, price, new_time, source, order)
+        on_trade(engine, msg, order)
+
+    positions follow our trades as they happen (see core/order_state.py,
+    `orders` also has live cash and open orders); TRADER UPDATE snapshots
+    only reconcile them. open_orders stays the latest snapshot.
+
+    price_mode is 'mid' or 'micro' (size weighted, as betabot4 uses).
+    conflate batches MARKET UPDATEs (see core/conflation.py): 'packet' runs
+    on_market once per packet of books, a number once per that many case
+    seconds, and the hook then gets the list of tickers updated in the batch
+    as `security`. A batch still open when a TRADER UPDATE or NEWS arrives
+    is run before their hooks ('packet' always, a time slice once it has
+    run its length); flush_market runs one early. None calls it per message.
+    log_file, if set, gets every message through an EventRecorder (JSON lines).
+    priors, if set, is a PriorCache (core/priors.py) or the path of one:
+    source reliability and return stats from earlier sessions of the same
+    case seed the live ones at registration, and are written back every
+    history_every ticks and at exit (save_priors). Offline runs leave it
+    unset, so one run never sees what another left behind.
+    """
+
+    __slots__ = (
+        'registry', 'securities', 'index', 'case_length', 'time', 'last_news_time', 'ticks',
+        'precision', 'books', 'price', 'bid', 'ask', 'bid_size', 'ask_size', 'positions', 'open_orders', 'orders',
+        'predictions', 'pred_ttl', 'fairs', 'history', 'reliability', 'rho', 'price_stats', 'factor',
+        'price_mode', 'conflate', 'conflator', 'priors', 'recorder', 'history_file', 'history_every',
+        'on_register', 'on_market', 'on_trader', 'on_news', 'on_trade',
+    )
+
+    def __init__(self, start_reliability=30, price_mode='mid', log_file=None,
+                 history_file=None, history_every=30, pred_ttl=10, on_register=None, on_market=None,
+                 on_trader=None, on_news=None, on_trade=None, conflate=None, priors=None):
+        if price_mode not in ('mid', 'micro'):
+            raise ValueError("price_mode must be 'mid' or 'micro'")
+        if not (conflate is None or conflate == 'packet' or
+                isinstance(conflate, (int, float)) and not isinstance(conflate, bool) and conflate >= 0):
+            raise ValueError("conflate must be None, 'packet' or a number of seconds")
+
+        self.registry = TickerRegistry()
+        self.securities = self.registry.tickers
+        self.index = self.registry.ids
+        self.case_length = None
+        self.time = 0
+        self.last_news_time = -10
+        self.ticks = 0
+
+        self.precision = None
+        self.books = None  # latest core.book.Book of each security
+        self.price = None
+        self.bid = None
+        self.ask = None
+        self.bid_size = None
+        self.ask_size = None
+        self.positions = None
+        self.open_orders = {}
+        self.orders = OrderState()  # live from TRADE / ACK MODIFY ORDERS
+
+        self.predictions = PredictionStore()  # live news preds, expired pred_ttl seconds past their time
+        self.pred_ttl = pred_ttl
+        self.fairs = None
+        self.history = None
+        self.reliability = ReliabilityTracker(start_reliability)
+        self.rho = None          # running stats of returns
+        self.price_stats = None  # running stats of price levels
+        self.factor = None       # one-factor model of returns, for the beta fairs
+
+        self.price_mode = price_mode
+        self.conflate = conflate
+        self.conflator = None  # made at registration, once the securities are known
+        self.priors = PriorCache(priors) if isinstance(priors, str) else priors
+        self.recorder = EventRecorder(log_file) if log_file else None
+        self.history_file = history_file
+        self.history_every = history_every
+
+        self.on_register = on_register
+        self.on_market = on_market
+        self.on_trader = on_trader
+        self.on_news = on_news
+        self.on_trade = on_trade
+
+    def attach(self, t):
+        ## points a tradersbot.TradersBot (or anything with the same callbacks) at this engine
+        t.onAckRegister = self.ack_register_method
+        t.onMarketUpdate = self.market_update_method
+        t.onTraderUpdate = self.trader_update_method
+        t.onNews = self.news_method
+        t.onTrade = self.trade_method
+        t.onAckModifyOrders = self.ack_modify_orders_method
+        return t
+
+    def _log(self, msg):
+        if self.recorder is not None:
+            self.recorder.record(msg)
+
+    ## handlers
+
+    def ack_register_method(self, msg, order):
+        self._log(msg)
+        security_dict = msg['case_meta']['securities']
+        self.registry = TickerRegistry.from_case_meta(msg['case_meta'])
+        self.securities = self.registry.tickers
+        self.index = self.registry.ids
+        self.case_length = msg['case_meta']['case_length']
+
+        n = len(self.registry)
+        self.precision = self.registry.to_array(
+            {security: spec.get('precision', 2) for security, spec in security_dict.items()}, 2, int)
+        self.books = [None] * n
+        self.price = np.full(n, np.nan)
+        self.bid = np.full(n, np.nan)
+        self.ask = np.full(n, np.nan)
+        self.bid_size = np.full(n, np.nan)
+        self.ask_size = np.full(n, np.nan)
+        self.positions = np.zeros(n, dtype=int)
+        if 'trader_state' in msg:
+            self.orders.reconcile(msg['trader_state'])
+            self.registry.assign(self.positions, self.orders.positions)
+        self.registry.assign(self.price, {security: spec['starting_price']
+                                          for security, spec in security_dict.items() if spec['tradeable']})
+
+        self.history = PriceHistory(self.securities, capacity=self.case_length+1)
+        self.rho = StreamingCorrelation(n, returns=True)
+        self.price_stats = StreamingCorrelation(n)
+        self.factor = FactorModel(n)
+        if self.conflate is not None:
+            self.conflator = MarketConflator(n, None if self.conflate == 'packet' else self.conflate)
+        if self.priors is not None:
+            self.priors.apply(self, msg['case_meta'])
+            atexit.unregister(self.save_priors)
+            atexit.register(self.save_priors)  # sessions usually end by being killed or timing out
+
+        if self.on_register is not None:
+            self.on_register(self, order)
+
+    def market_update_method(self, msg, order):
+        self._log(msg)
+        market_state = msg['market_state']
+        security = market_state['ticker']
+        i = self.index[security]
+        ## a few market updates arrive without a timestamp, keep the last one
+        time = msg.get('elapsed_time', self.time)
+
+        conflator = self.conflator
+        if conflator is not None and self.on_market is not None and conflator.late(time):
+            ## the last packet was short: run it on the books it had, before this one lands
+            self.on_market(self, conflator.take(), order)
+
+        book = self.books[i] = Book(market_state, self.precision[i])
+        if not book.two_sided:
+            self.bid[i] = self.ask[i] = np.nan
+            self.bid_size[i] = self.ask_size[i] = np.nan
+            self.price[i] = book.last_price
+        else:
+            self.bid[i], self.ask[i] = book.best_bid, book.best_ask
+            self.bid_size[i], self.ask_size[i] = book.bid_size, book.ask_size
+            self.price[i] = book.microprice() if self.price_mode == 'micro' else book.mid()
+
+        self.time = time
+
+        if self.on_market is None:
+            return
+        if conflator is None:
+            self.on_market(self, security, order)
+        else:
+            batch = conflator.add(security, time)
+            if batch is not None:
+                self.on_market(self, batch, order)
+
+    def flush_market(self, order):
+        ## runs on_market for a conflated batch that is still open, if any
+        if self.conflator is not None and len(self.conflator) and self.on_market is not None:
+            self.on_market(self, self.conflator.take(), order)
+
+    def _close_market(self, msg, order):
+        ## before the TRADER UPDATE / NEWS hooks: a packet's books are all in by then, and a
+        ## time slice that has run its length (by the message's own time, if it has one)
+        ## closes without waiting for the next book
+        conflator = self.conflator
+        if conflator is not None and (conflator.interval is None or
+                                      conflator.ready(msg.get('elapsed_time', self.time))):
+            self.flush_market(order)
+
+    def trader_update_method(self, msg, order):
+        self._log(msg)
+        self.history.record(self.time, self.price, bid=self.bid, ask=self.ask,
+                            bid_size=self.bid_size, ask_size=self.ask_size)
+        self.reliability.observe(self.time, self.price)
+        self.rho.update(self.price)
+        self.price_stats.update(self.price)
+        self.factor.update(self.price)
+        self.predictions.expire(self.time - self.pred_ttl)
+        self.ticks += 1
+
+        trader_state = msg['trader_state']
+        self.orders.reconcile(trader_state)
+        self.registry.assign(self.positions, trader_state['positions'])
+        self.open_orders = trader_state['open_orders']
+
+        self._close_market(msg, order)
+        if self.on_trader is not None:
+            self.on_trader(self, order)
+
+        if self.ticks % self.history_every == 0:
+            if self.history_file:
+                self.dump_history()
+            self.save_priors()
+
+    def news_method(self, msg, order):
+        self._log(msg)
+        info = msg['news']['headline'].split()
+        security = info[0]
+        new_time = float(info[1])
+        price = float(msg['news']['body'])
+        source = msg['news']['source']
+
+        self.predictions.add(self.index[security], price, new_time, source)
+        self.reliability.add(source, self.index[security], price, new_time)
+        self.last_news_time = self.time
+
+        self._close_market(msg, order)
+        if self.on_news is not None:
+            self.on_news(self, security, price, new_time, source, order)
+
+    def trade_method(self, msg, order):
+        self._log(msg)
+        for security in self.orders.on_trade(msg):
+            if security in self.index:
+                self.positions[self.index[security]] = self.orders.positions[security]
+        if self.on_trade is not None:
+            self.on_trade(self, msg, order)
+
+    def ack_modify_orders_method(self, msg, order):
+        self._log(msg)
+        self.orders.on_ack(msg)
+
+    ## shared strategy pieces
+
+    def update_fairs(self, min_reliability, default_confidence, pred_horizon=None,
+                     beta_ci=None, beta_after=50):
+        """Fair value of every security at the next reliable prediction time.
+
+        Returns (closest_time, {security: (fair, ci, flag)}) with flag one of
+        'none', 'news' or 'beta'. Preds up to `pred_horizon` seconds past the
+        closest time are used (None = any later pred, 0 = that exact time),
+        the latest one to arrive winning. If `beta_ci(n_news)` is given (and
+        the factor model has seen `beta_after` ticks, priors included),
+        securities without news get a fair implied by the market factor the
+        ones that have it point to (see core/factor.py), O(n) per call;
+        beta_ci='model' uses the factor model's own CI for them.
+        """
+        preds = self.predictions
+        reliability = preds.source_reliability(self.reliability)
+        security, price, new_time = preds.security, preds.price, preds.new_time
+
+        ## compute next reliable pred
+        reliable = reliability <= min_reliability
+        closest_time = min(preds.next_after(self.time, reliable), 100000) # effective INF
+
+        ## now compute fairs for every stock for that time
+        usable = reliable & (new_time >= closest_time)
+        if pred_horizon is not None:
+            usable &= new_time <= closest_time + pred_horizon
+        chosen = np.full(len(self.securities), -1)
+        rows = np.nonzero(usable)[0]
+        np.maximum.at(chosen, security[rows], rows)
+        has_news = chosen >= 0
+        pick = chosen[has_news]
+
+        fair = self.price.copy()
+        ci = np.full(len(self.securities), float(default_confidence))
+        flag = np.full(len(self.securities), 'none', dtype=object)
+        fair[has_news] = price[pick]
+        ci[has_news] = reliability[pick]
+        flag[has_news] = 'news'
+
+        if len(pick) > 0 and beta_ci is not None and self.factor.count > beta_after:
+            ## the beta fill-in uses the horizon of the last news pred
+            time_remaining = new_time[pick[-1]] - self.time
+            drift_per_time = (price[pick] - self.price[has_news]) / (new_time[pick] - self.time)
+            drift, model_ci = self.factor.conditional(np.nonzero(has_news)[0], drift_per_time, time_remaining)
+
+            beta = ~has_news
+            fair[beta] = (self.price + drift * time_remaining)[beta]
+            ci[beta] = model_ci[beta] if beta_ci == 'model' else beta_ci(len(pick))
+            flag[beta] = 'beta'
+
+        fairs = {s: (fair[i], ci[i], flag[i]) for i, s in enumerate(self.securities)}
+        return closest_time, fairs
+
+    def save_priors(self):
+        ## folds this session's estimates so far into the prior cache, if there is one
+        if self.priors is not None and self.priors.key is not None:
+            self.priors.update(self)
+            self.priors.save()
+
+    def dump_history(self):
+        ## writes prices for the analysis notebook (history.csv) and the raw store next to it
+        np.savetxt(self.history_file, self.history.price, delimiter=",")
+        with open(self.history_file.rsplit('.', 1)[0] + '.pkl', 'wb') as f:
+            pickle.dump(self.history.price, f)
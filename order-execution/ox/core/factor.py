@@ -0,0 +1,119 @@
+import numpy as np
+
+
+class FactorModel(object):
+    """Recursive one-factor model of per-tick price changes across securities.
+
+        change_i = mu_i + beta_i * f + e_i,   f = the average change that tick
+
+    Every update folds one tick into running (Welford, or exponentially
+    weighted with halflife) moments of the factor and of each security
+    against it: O(n) per tick, against O(n^2) for the full correlation
+    matrix. Loadings, drifts and residual variances are read straight off
+    those sums.
+
+    conditional() is the news step: the drifts implied by the securities
+    that have a prediction are a noisy look at f (noise = their residual
+    variance), so a Kalman update of f from its N(0, var_f) prior gives the
+    factor estimate, and every other security's drift follows from its
+    loading, with a CI from its residual and the factor's posterior variance.
+    """
+
+    def __init__(self, n, halflife=None):
+        self.n = n
+        self.alpha = None if halflife is None else 1 - 0.5 ** (1.0 / halflife)
+
+        self.count = 0
+        self.mu = np.zeros(n)        # mean change of each security
+        self.f_mean = 0.0
+        self.f_var = 0.0
+        self._cov = np.zeros(n)      # co-moment of each security with f
+        self._var = np.zeros(n)      # co-moment of each security with itself
+        self._f_comoment = 0.0
+        self._last = None
+
+        self.factor = np.nan         # last conditional() estimate of f
+        self.factor_var = np.nan
+
+    def update(self, prices):
+        ## feeds one tick of prices (a nan change counts as no change)
+        prices = np.asarray(prices, dtype=float)
+        last, self._last = self._last, prices.copy()
+        if last is None:
+            return
+        x = prices - last
+        x[~np.isfinite(x)] = 0.0
+        f = x.mean()
+
+        self.count += 1
+        if self.alpha is None:
+            w = 1.0 / self.count
+            dx, df = x - self.mu, f - self.f_mean
+            self.mu += w * dx
+            self.f_mean += w * df
+            self._cov += dx * (f - self.f_mean)
+            self._var += dx * (x - self.mu)
+            self._f_comoment += df * (f - self.f_mean)
+            self.f_var = self._f_comoment / self.count
+        else:
+            if self.count == 1:
+                self.mu[:], self.f_mean = x, f
+                return
+            a = self.alpha
+            dx, df = x - self.mu, f - self.f_mean
+            self.mu += a * dx
+            self.f_mean += a * df
+            self._cov = (1 - a) * (self._cov + a * dx * df)
+            self._var = (1 - a) * (self._var + a * dx * dx)
+            self.f_var = (1 - a) * (self.f_var + a * df * df)
+
+    def prime(self, count, mean, cov):
+        ## starts from `count` pseudo ticks of changes with this mean / covariance
+        ## (the factor being the average change, its moments follow from them)
+        cov = np.asarray(cov, dtype=float)
+        self.count = count
+        self.mu[:] = mean
+        self.f_mean = float(np.mean(mean))
+        self.f_var = float(cov.mean())
+        scale = count if self.alpha is None else 1
+        self._cov = cov.mean(axis=1) * scale
+        self._var = np.diag(cov) * scale
+        self._f_comoment = self.f_var * count
+
+    def _moments(self):
+        if self.alpha is None:
+            return self._cov / max(self.count, 1), self._var / max(self.count, 1)
+        return self._cov, self._var
+
+    @property
+    def loadings(self):
+        ## beta of every security to the factor (0 until the factor has moved)
+        cov, _ = self._moments()
+        return cov / self.f_var if self.f_var > 0 else np.zeros(self.n)
+
+    @property
+    def resid_var(self):
+        ## per tick variance of each security left over after the factor
+        cov, var = self._moments()
+        beta = self.loadings
+        return np.maximum(var - beta * cov, 1e-12)
+
+    def conditional(self, idx, drifts, horizon=1.0):
+        """Drift of every security given predicted drifts (per tick) of the
+        securities in idx. Returns (drift, ci): ci is the standard deviation
+        of each security's move over `horizon` ticks under that drift.
+        Securities in idx keep the drifts given, with ci 0."""
+        beta = self.loadings
+        resid = self.resid_var
+        prior = self.f_var if self.f_var > 0 else np.inf
+
+        b, surprise = beta[idx], np.asarray(drifts, dtype=float) - self.mu[idx]
+        precision = 1.0 / prior + (b * b / resid[idx]).sum()
+        self.factor_var = 1.0 / precision
+        self.factor = self.factor_var * (b * surprise / resid[idx]).sum()
+
+        drift = self.mu + beta * self.factor
+        ci = np.sqrt(resid * horizon + (beta * horizon) ** 2 * self.factor_var)
+        drift[idx] = drifts
+        ci[idx] = 0.0
+        return drift, ci
@@ -0,0 +1,88 @@
+import numpy as np
+
+
+class PriceHistory(object):
+    """Preallocated columnar store of per-tick prices for every security.
+
+    One row is recorded per trader tick; each field is a (rows, securities)
+    float array with columns in `securities` order. Reading a field or a
+    time window returns a view, so nothing on the hot path copies history.
+    Capacity doubles if a case runs longer than expected.
+    """
+
+    FIELDS = ('price', 'bid', 'ask', 'mid', 'micro', 'bid_size', 'ask_size')
+
+    def __init__(self, securities, capacity=1024):
+        self.securities = list(securities)
+        self.index = {security: i for i, security in enumerate(self.securities)}
+        self._n = 0
+        self._times = np.full(capacity, np.nan)
+        self._data = {field: np.full((capacity, len(self.securities)), np.nan) for field in self.FIELDS}
+
+    def __len__(self):
+        return self._n
+
+    def _column(self, values):
+        ## accepts {security: value} dicts (like CURRENT['BIDS']) or sequences in securities order
+        if values is None:
+            return np.nan
+        if hasattr(values, 'get'):
+            values = [values.get(security) for security in self.securities]
+        return [np.nan if v is None else v for v in values]
+
+    def _grow(self):
+        capacity = 2 * len(self._times)
+        times = np.full(capacity, np.nan)
+        times[:self._n] = self._times[:self._n]
+        self._times = times
+        for field, old in self._data.items():
+            new = np.full((capacity, len(self.securities)), np.nan)
+            new[:self._n] = old[:self._n]
+            self._data[field] = new
+
+    def record(self, time, price, bid=None, ask=None, bid_size=None, ask_size=None):
+        if self._n == len(self._times):
+            self._grow()
+        row = self._n
+
+        self._times[row] = np.nan if time is None else time
+        self._data['price'][row] = self._column(price)
+        self._data['bid'][row] = self._column(bid)
+        self._data['ask'][row] = self._column(ask)
+        self._data['bid_size'][row] = self._column(bid_size)
+        self._data['ask_size'][row] = self._column(ask_size)
+
+        b, a = self._data['bid'][row], self._data['ask'][row]
+        bs, az = self._data['bid_size'][row], self._data['ask_size'][row]
+        self._data['mid'][row] = (a + b) / 2
+        with np.errstate(divide='ignore', invalid='ignore'):
+            micro = (a * bs + b * az) / (bs + az)
+        self._data['micro'][row] = np.where(np.isnan(micro), self._data['mid'][row], micro)
+
+        self._n += 1
+
+    @property
+    def times(self):
+        return self._times[:self._n]
+
+    @property
+    def price(self):
+        return self._data['price'][:self._n]
+
+    def field(self, name):
+        return self._data[name][:self._n]
+
+    def __getitem__(self, name):
+        return self.field(name)
+
+    def last(self, name='price'):
+        return self._data[name][self._n - 1]
+
+    def row_at(self, time):
+        ## first row recorded at or after `time` (times only ever increase)
+        return int(np.searchsorted(self.times, time))
+
+    def window(self, t_begin, t_end, name='price'):
+        ## view of the rows recorded in [t_begin, t_end)
+        times = self.times
+        return self._data[name][np.searchsorted(times, t_begin):np.searchsorted(times, t_end)]
@@ -0,0 +1,197 @@
+import atexit
+import datetime
+import json
+import os
+import re
+import sys
+import time
+
+from core.recorder import CALLBACKS
+
+## OX_INSTRUMENT=1 prints summaries, OX_INSTRUMENT=<path> appends them to <path> as JSON lines
+ENV = 'OX_INSTRUMENT'
+ENV_EVERY = 'OX_INSTRUMENT_EVERY'  # seconds between summaries, 30 by default
+
+HANDLERS = sorted(set(CALLBACKS.values()) | {'onPing'})
+
+
+class Histogram(object):
+    """Fixed-bucket log-linear histogram of non-negative ints, HDR style.
+
+    Values below 2 * SUB are counted exactly; above that every power of two
+    is split into SUB buckets, so a recorded value is off by at most 1/SUB
+    (about 3%). record() is a bit_length and a list increment; values past
+    2 ** MAX_BITS land in the last bucket.
+    """
+
+    SUB_BITS = 5
+    SUB = 1 << SUB_BITS
+    MAX_BITS = 40  # ~18 minutes in ns
+
+    __slots__ = ('counts', 'n', 'total', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (2 * self.SUB + (self.MAX_BITS - self.SUB_BITS) * self.SUB)
+        self.n = 0
+        self.total = 0
+        self.max = 0
+
+    def _index(self, value):
+        if value < 2 * self.SUB:
+            return value
+        shift = value.bit_length() - self.SUB_BITS - 1
+        return min(2 * self.SUB + (shift - 1) * self.SUB + (value >> shift) - self.SUB, len(self.counts) - 1)
+
+    def _upper(self, index):
+        ## largest value that lands in bucket `index`
+        if index < 2 * self.SUB:
+            return index
+        shift, sub = divmod(index - 2 * self.SUB, self.SUB)
+        return ((sub + self.SUB + 1) << (shift + 1)) - 1
+
+    def record(self, value):
+        value = int(value)
+        if value < 0:
+            value = 0
+        self.counts[self._index(value)] += 1
+        self.n += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, q):
+        if self.n == 0:
+            return 0
+        rank = max(1, int(q / 100.0 * self.n + 0.5))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self._upper(index), self.max)
+        return self.max
+
+    def mean(self):
+        return self.total / self.n if self.n else 0.0
+
+    def merge(self, other):
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+        self.n += other.n
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def summary(self, scale=1.0):
+        ## count, mean, p50 / p90 / p99 / max, values divided by scale
+        return {
+            'count': self.n, 'mean': self.mean() / scale,
+            'p50': self.percentile(50) / scale, 'p90': self.percentile(90) / scale,
+            'p99': self.percentile(99) / scale, 'max': self.max / scale,
+        }
+
+
+_FRACTION = re.compile(r'(\.\d{6})\d+')
+
+
+def parse_time(stamp):
+    ## exchange timestamps ('2019-11-10T06:27:36.1619033-05:00') to epoch seconds, None if unparseable
+    try:
+        stamp = datetime.datetime.fromisoformat(_FRACTION.sub(r'\1', stamp))
+    except (TypeError, ValueError):
+        return None
+    return stamp.timestamp()
+
+
+class Instrumentation(object):
+    """Wall time of every handler, feed lag and orders per tick for one bot.
+
+    wrap(t) replaces each callback set on t with a timed version, so it goes
+    right before t.run(), after every handler is attached. Per handler it
+    keeps a Histogram of wall times (ns). For MARKET UPDATEs it records how
+    far behind the feed we are: local clock minus market_state['time'],
+    less the smallest such gap seen, since the two clocks are not in sync.
+    Orders and cancels placed between TRADER UPDATEs count as one tick.
+    Every `every` seconds (and at exit) a summary goes to `out`, a path
+    for JSON lines, or stdout if None.
+    """
+
+    def __init__(self, every=30.0, out=None):
+        self.every = every
+        self.out = out
+
+        self.handlers = {}
+        self.lag = Histogram()            # ns behind the least-lagged update seen
+        self.orders_per_tick = Histogram()
+        self.min_offset = None
+        self._tick_orders = 0
+        self._next_summary = time.time() + every
+
+    def wrap(self, t):
+        for name in HANDLERS:
+            callback = getattr(t, name, None)
+            if callback is not None:
+                setattr(t, name, self._timed(name, callback))
+        atexit.register(self.dump)
+        return t
+
+    def _timed(self, name, callback):
+        histogram = self.handlers[name] = Histogram()
+        clock = time.perf_counter_ns
+
+        def timed(msg, order):
+            start = clock()
+            try:
+                return callback(msg, order)
+            finally:
+                histogram.record(clock() - start)
+                self._after(msg, order)
+        return timed
+
+    def _after(self, msg, order):
+        self._tick_orders += len(order.orders) + len(order.cancels)
+
+        message_type = msg.get('message_type')
+        if message_type == 'MARKET UPDATE':
+            sent = parse_time(msg['market_state'].get('time'))
+            if sent is not None:
+                offset = time.time() - sent
+                if self.min_offset is None or offset < self.min_offset:
+                    self.min_offset = offset
+                self.lag.record((offset - self.min_offset) * 1e9)
+        elif message_type == 'TRADER UPDATE':
+            self.orders_per_tick.record(self._tick_orders)
+            self._tick_orders = 0
+
+        now = time.time()
+        if now >= self._next_summary:
+            self._next_summary = now + self.every
+            self.dump()
+
+    def summary(self):
+        return {
+            'time': time.time(),
+            'handlers_us': {name: h.summary(1e3) for name, h in self.handlers.items() if h.n},
+            'feed_lag_ms': self.lag.summary(1e6),
+            'clock_offset_s': self.min_offset,
+            'orders_per_tick': self.orders_per_tick.summary(),
+        }
+
+    def dump(self):
+        line = json.dumps(self.summary())
+        if self.out is None:
+            print(line)
+            sys.stdout.flush()
+        else:
+            with open(self.out, 'a') as f:
+                f.write(line + '\n')
+
+
+def instrument(t):
+    """Instruments t's handlers if OX_INSTRUMENT is set, else leaves t alone.
+    Returns the Instrumentation, or None when off."""
+    setting = os.environ.get(ENV, '')
+    if setting in ('', '0'):
+        return None
+    every = float(os.environ.get(ENV_EVERY, 30))
+    instrumentation = Instrumentation(every, out=None if setting == '1' else setting)
+    instrumentation.wrap(t)
+    return instrumentation
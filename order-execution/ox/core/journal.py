@@ -0,0 +1,58 @@
+import pickle
+
+import numpy as np
+
+from core.recorder import EventRecorder, read_events
+
+## same fields as the trade dicts in msg['trades'] (and trades.pkl)
+TRADE_DTYPE = np.dtype([
+    ('trade_id', 'i8'), ('ticker', 'U16'), ('price', 'f8'), ('quantity', 'i8'), ('buy', '?'),
+    ('buy_order_id', 'i8'), ('sell_order_id', 'i8'), ('time', 'U40'),
+])
+
+
+class TradeJournal(object):
+    """Append-only journal of the trades we see, one JSON line per trade.
+
+    append() hands trades to a background EventRecorder, so the onTrade
+    callback never rewrites the file; the writer fsyncs at least every
+    fsync_interval seconds and no trade is dropped when it falls behind.
+    The file is opened for appending, so a restarted bot adds to the trades
+    of earlier sessions instead of wiping them.
+    """
+
+    def __init__(self, path='trades.jsonl', fsync_interval=5.0):
+        self.path = path
+        self.count = 0
+        self._recorder = EventRecorder(path, block=True, fsync_interval=fsync_interval, mode='a')
+
+    def append(self, trades):
+        for trade in trades:
+            self._recorder.record(trade)
+        self.count += len(trades)
+
+    def close(self):
+        self._recorder.close()
+
+
+def load_trades(path):
+    ## list of trade dicts, as pickle.load(open("trades.pkl", 'rb')) used to give
+    if path.endswith('.pkl'):
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    return list(read_events(path))
+
+
+def trades_array(trades):
+    ## numpy structured array (TRADE_DTYPE) of a journal / trades.pkl path or a list of trades
+    if isinstance(trades, str):
+        trades = load_trades(trades)
+    return np.array([tuple(trade[name] for name in TRADE_DTYPE.names) for trade in trades], dtype=TRADE_DTYPE)
+
+
+def trades_frame(trades):
+    ## same data as a pandas DataFrame, columns in the order trades.pkl dicts have them
+    import pandas as pd
+    if isinstance(trades, str):
+        trades = load_trades(trades)
+    return pd.DataFrame(trades)
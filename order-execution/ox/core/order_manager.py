@@ -0,0 +1,101 @@
+from collections import Counter
+
+
+class OrderManager(object):
+    """Holds the quotes a strategy wants resting and sends only the difference.
+
+    Instead of cancelling every open order and placing a fresh set each
+    tick, a strategy describes the orders it wants with addBuy / addSell
+    (the same calls it makes on the tradersbot `order`, so it can be handed
+    the manager instead) and then calls sync() with the open orders from
+    the latest TRADER UPDATE. sync() keeps every open order that matches a
+    wanted one on ticker, side, price and quantity, so it keeps its queue
+    priority, cancels the rest and adds what is missing, all into the one
+    `order` batch.
+
+    Prices are rounded to the security's precision first, as the exchange
+    does, so a wanted quote compares equal to the order it became. With
+    size_step set, quantities are rounded down to a multiple of it (a quote
+    that rounds to 0 is dropped), so a size that follows the position only
+    moves, and loses its queue spot, when the position crosses a step. Orders
+    sent since the last snapshot count as open until the next one arrives,
+    so syncing twice between TRADER UPDATEs does not send them twice.
+    """
+
+    def __init__(self, precision=2, max_open_orders=None, size_step=None):
+        self.precision = precision  # int, or {ticker: int}
+        self.max_open_orders = max_open_orders
+        self.size_step = size_step
+
+        self.wanted = []  # [(ticker, buy, price, quantity)] since the last sync
+        self._snapshot = None
+        self._sent = Counter()   # adds sent since _snapshot
+        self._cancelled = set()  # order ids cancelled since _snapshot
+
+        self.kept = 0
+        self.added = 0
+        self.cancelled = 0
+
+    def _round(self, ticker, price):
+        digits = self.precision.get(ticker, 2) if isinstance(self.precision, dict) else self.precision
+        return round(float(price), digits)
+
+    def addTrade(self, ticker, isBuy, quantity, price):
+        ## resting quotes only: no market orders, quantity 0 means no quote
+        if quantity < 0:
+            quantity, isBuy = -quantity, not isBuy
+        if self.size_step:
+            quantity = quantity // self.size_step * self.size_step
+        if quantity == 0:
+            return
+        self.wanted.append((ticker, bool(isBuy), self._round(ticker, price), int(quantity)))
+
+    def addBuy(self, ticker, quantity, price):
+        self.addTrade(ticker, True, quantity, price)
+
+    def addSell(self, ticker, quantity, price):
+        self.addTrade(ticker, False, quantity, price)
+
+    def sync(self, open_orders, order):
+        """Puts the cancels and adds that turn open_orders into the wanted
+        quotes on `order`, clears the wanted set and returns (kept, cancels, adds).
+        open_orders is trader_state['open_orders'] ({order_id: {...}})."""
+        if open_orders is not self._snapshot:
+            self._snapshot = open_orders
+            self._sent.clear()
+            self._cancelled.clear()
+
+        missing = Counter(self.wanted)
+        self.wanted = []
+
+        kept = cancels = 0
+        for order_id, o in open_orders.items():
+            order_id = int(order_id)
+            if order_id in self._cancelled:
+                continue
+            key = (o['ticker'], bool(o['buy']), self._round(o['ticker'], o['price']), int(o['quantity']))
+            if missing[key] > 0:
+                missing[key] -= 1
+                kept += 1
+            else:
+                order.addCancel(o['ticker'], order_id)
+                self._cancelled.add(order_id)
+                cancels += 1
+
+        for key, n in self._sent.items():  # sent, not in a snapshot yet
+            missing[key] -= min(n, missing[key])
+
+        room = None if self.max_open_orders is None else self.max_open_orders - kept - sum(self._sent.values())
+        adds = 0
+        for (ticker, buy, price, quantity), n in missing.items():
+            for _ in range(n):
+                if room is not None and adds >= room:
+                    break
+                order.addTrade(ticker, buy, quantity, price)
+                self._sent[(ticker, buy, price, quantity)] += 1
+                adds += 1
+
+        self.kept += kept
+        self.cancelled += cancels
+        self.added += adds
+        return kept, cancels, adds
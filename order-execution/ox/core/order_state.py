@@ -0,0 +1,89 @@
+def _amount(value):
+    ## cash comes as {'USD': x}
+    if isinstance(value, dict):
+        return float(sum(value.values()))
+    return float(value)
+
+
+class OrderState(object):
+    """Our positions, cash and open orders, kept live from the exchange's replies.
+
+    The Python take on MyState in hft/competitor.cpp: ACK MODIFY ORDERS tells
+    us which order ids are ours (and which cancels went through), TRADE
+    messages move positions and cash and shrink our resting orders. Each
+    update is a couple of dict operations, so positions are right between
+    the once-a-second TRADER UPDATE snapshots instead of up to a second
+    stale. reconcile() takes a snapshot as the truth and counts how often
+    it disagreed with the live view (`drift`).
+
+    open_orders has the trader_state layout, {order_id: {'ticker', 'buy',
+    'quantity', 'price', 'order_id'}}, keyed by int.
+    """
+
+    def __init__(self, positions=None, cash=0.0):
+        self.positions = dict(positions or {})  # ticker -> shares
+        self.cash = float(cash)
+        self.open_orders = {}
+        self.ours = set()  # ids of every order the exchange has acked for us
+
+        self.trades = 0
+        self.drift = 0  # snapshots that disagreed with the live view
+
+    def position(self, ticker):
+        return self.positions.get(ticker, 0)
+
+    def on_ack(self, msg):
+        ## ACK MODIFY ORDERS: orders accepted (rejects carry an error) and cancels done
+        for o in msg.get('orders', []):
+            if o.get('error') or o.get('order_id') is None:
+                continue
+            order_id = int(o['order_id'])
+            self.ours.add(order_id)
+            if o.get('price') is not None:  # market orders never rest
+                self.open_orders[order_id] = {
+                    'ticker': o['ticker'], 'buy': o['buy'], 'quantity': o['quantity'],
+                    'price': o['price'], 'order_id': order_id,
+                }
+        ## a failed cancel means the order is gone already (filled), either way it is not open
+        for order_id in msg.get('cancels', {}):
+            self.open_orders.pop(int(order_id), None)
+
+    def on_trade(self, msg):
+        ## TRADE: returns the tickers whose position changed
+        changed = []
+        for trade in msg.get('trades', []):
+            bought = self._fill(trade.get('buy_order_id'), trade['quantity'])
+            sold = self._fill(trade.get('sell_order_id'), trade['quantity'])
+            if bought == sold:  # not ours, or a self trade
+                continue
+            ticker, quantity = trade['ticker'], trade['quantity'] if bought else -trade['quantity']
+            self.positions[ticker] = self.positions.get(ticker, 0) + quantity
+            self.cash -= quantity * trade['price']
+            self.trades += 1
+            changed.append(ticker)
+        return changed
+
+    def _fill(self, order_id, quantity):
+        ## True if order_id is one of ours, shrinking it if it rests
+        if not order_id or int(order_id) not in self.ours:
+            return False
+        o = self.open_orders.get(int(order_id))
+        if o is not None:
+            o['quantity'] -= quantity
+            if o['quantity'] <= 0:
+                del self.open_orders[int(order_id)]
+        return True
+
+    def reconcile(self, trader_state):
+        ## replaces the live view with a TRADER UPDATE / ACK REGISTER trader_state
+        positions = dict(trader_state['positions'])
+        open_orders = {int(order_id): dict(o) for order_id, o in trader_state['open_orders'].items()}
+        cash = _amount(trader_state['cash'])
+
+        if (any(self.positions.get(t, 0) != q for t, q in positions.items())
+                or set(open_orders) != set(self.open_orders)):
+            self.drift += 1
+        self.positions = positions
+        self.open_orders = open_orders
+        self.cash = cash
+        self.ours.update(open_orders)
@@ -0,0 +1,58 @@
+class OrderBatch(object):
+    """Orders and cancels placed during one callback.
+
+    Same interface and semantics as tradersbot's TradersOrder, the `order`
+    object handed to every callback (addBuy / addSell / addTrade /
+    addCancel): a negative quantity flips the side, a zero quantity is
+    ignored, no price means a market order. A batch that is not empty is
+    sent as one MODIFY ORDERS message.
+    """
+
+    __slots__ = ('orders', 'cancels')
+
+    def __init__(self):
+        self.orders = []   # [{'ticker', 'buy', 'quantity', 'price'}], price None = market order
+        self.cancels = []  # [{'ticker', 'order_id'}]
+
+    def __len__(self):
+        return len(self.orders) + len(self.cancels)
+
+    def addTrade(self, ticker, isBuy, quantity, price=None, token=None):
+        if quantity == 0:
+            return
+        if quantity < 0:
+            quantity = -quantity
+            isBuy = not isBuy
+        o = {'ticker': ticker, 'buy': isBuy, 'quantity': quantity, 'price': price}
+        if token is not None:
+            o['token'] = token
+        self.orders.append(o)
+
+    def addBuy(self, ticker, quantity, price=None, token=None):
+        self.addTrade(ticker, True, quantity, price, token)
+
+    def addSell(self, ticker, quantity, price=None, token=None):
+        self.addTrade(ticker, False, quantity, price, token)
+
+    def addCancel(self, ticker, orderId):
+        self.cancels.append({'ticker': ticker, 'order_id': orderId})
+
+    def to_message(self, token=None):
+        ## the MODIFY ORDERS message TradersOrder.toJson would send (as a dict)
+        msg = {'message_type': 'MODIFY ORDERS'}
+        if self.orders:
+            msg['orders'] = [{k: v for k, v in o.items() if not (k == 'price' and v is None)} for o in self.orders]
+        if self.cancels:
+            msg['cancels'] = list(self.cancels)
+        if token is not None:
+            msg['token'] = token
+        return msg
+
+    @classmethod
+    def from_message(cls, msg):
+        ## the batch behind a MODIFY ORDERS message, as an exchange stand-in receives it
+        batch = cls()
+        for o in msg.get('orders', []):
+            batch.orders.append(dict(o, price=o.get('price')))
+        batch.cancels.extend(msg.get('cancels', []))
+        return batch
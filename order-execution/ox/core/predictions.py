@@ -0,0 +1,139 @@
+import heapq
+
+import numpy as np
+
+
+class PredictionStore(object):
+    """Live news predictions held column-wise: security index, price, target
+    time and source id, in the order they arrived.
+
+    Keeping them in flat numpy columns lets the fair value of all securities
+    be worked out with masks instead of a Python loop per security. A heap of
+    target times drives expiry: expire(t) drops every prediction aimed before
+    t, so the columns only ever hold the horizons still worth looking at.
+    Adding is O(log n); expiring costs one compaction per call that has
+    something to drop.
+
+    due() and next_after() binary search a time-sorted view of the rows,
+    rebuilt (one argsort) the first time they are asked after the store
+    changed. News is rare next to ticks, so most calls reuse it.
+    """
+
+    COLUMNS = ('_security', '_price', '_new_time', '_source')
+
+    def __init__(self, capacity=256):
+        self.sources = []       # source id -> name
+        self.source_index = {}  # name -> source id
+
+        self._n = 0
+        self._security = np.empty(capacity, dtype=int)
+        self._price = np.empty(capacity)
+        self._new_time = np.empty(capacity)
+        self._source = np.empty(capacity, dtype=int)
+        self._times = []  # heap of the target times still held
+        self._by_time = None  # rows in target time order, None once the store changes
+
+    def __len__(self):
+        return self._n
+
+    def _grow(self):
+        for name in self.COLUMNS:
+            old = getattr(self, name)
+            new = np.empty(2 * len(old), dtype=old.dtype)
+            new[:self._n] = old[:self._n]
+            setattr(self, name, new)
+
+    def _keep(self, keep):
+        ## compacts the columns down to the rows where keep is True, order preserved
+        n = int(keep.sum())
+        for name in self.COLUMNS:
+            column = getattr(self, name)
+            column[:n] = column[:self._n][keep]
+        self._n = n
+        self._by_time = None
+
+    def _sorted(self):
+        ## (rows in target time order, their target times); ties keep arrival order
+        if self._by_time is None:
+            self._by_time = np.argsort(self.new_time, kind='stable')
+        return self._by_time, self._new_time[self._by_time]
+
+    def add(self, security_idx, price, new_time, source):
+        if source not in self.source_index:
+            self.source_index[source] = len(self.sources)
+            self.sources.append(source)
+        if self._n == len(self._price):
+            self._grow()
+
+        row = self._n
+        self._security[row] = security_idx
+        self._price[row] = price
+        self._new_time[row] = new_time
+        self._source[row] = self.source_index[source]
+        self._n += 1
+        self._by_time = None
+        heapq.heappush(self._times, new_time)
+
+    def expire(self, before):
+        ## drops every prediction with a target time before `before`, returns how many
+        if not self._times or self._times[0] >= before:
+            return 0
+        while self._times and self._times[0] < before:
+            heapq.heappop(self._times)
+        n = self._n
+        self._keep(self.new_time >= before)
+        return n - self._n
+
+    def due(self, time):
+        ## rows whose target time has passed, ascending (valid until the store next changes)
+        by_time, times = self._sorted()
+        return np.sort(by_time[:np.searchsorted(times, time, side='left')])
+
+    def drop(self, rows):
+        ## removes rows (from due() or a mask) once a strategy is done with them
+        if len(rows) == 0:
+            return
+        keep = np.ones(self._n, dtype=bool)
+        keep[rows] = False
+        self._keep(keep)  # their heap entries go lazily, at the next expire past them
+
+    def next_after(self, time, mask=None):
+        ## earliest target time after `time` (among rows in mask), inf if there is none
+        by_time, times = self._sorted()
+        start = np.searchsorted(times, time, side='right')
+        if mask is None:
+            return times[start] if start < len(times) else np.inf
+        ## first masked row from there on, in time order
+        hits = np.asarray(mask)[by_time[start:]]
+        first = hits.argmax() if len(hits) else 0
+        return times[start + first] if len(hits) and hits[first] else np.inf
+
+    def for_security(self, security_idx):
+        ## [(price, new_time, source)] of one security, oldest first
+        rows = np.nonzero(self.security == security_idx)[0]
+        return [(self._price[r], self._new_time[r], self.sources[self._source[r]]) for r in rows]
+
+    def row(self, r):
+        ## (price, new_time, source) of one row
+        return self._price[r], self._new_time[r], self.sources[self._source[r]]
+
+    @property
+    def security(self):
+        return self._security[:self._n]
+
+    @property
+    def price(self):
+        return self._price[:self._n]
+
+    @property
+    def new_time(self):
+        return self._new_time[:self._n]
+
+    @property
+    def source(self):
+        return self._source[:self._n]
+
+    def source_reliability(self, reliability):
+        ## current reliability (a ReliabilityTracker) of the source behind every prediction
+        by_source = np.array([reliability[source] for source in self.sources], dtype=float)
+        return by_source[self.source] if len(by_source) else np.empty(0)
@@ -0,0 +1,106 @@
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+
+
+def case_key(case_meta, case=None):
+    """Key of the entry a session reads and writes.
+
+    The tickers and case_length alone name a ticker universe, which every
+    case of a competition may share (supp_1..3 are all TRDRS1..9 over 450s).
+    The news sources, when case_meta lists them, and `case`, a name the
+    caller gives the case, narrow it down to one case.
+    """
+    key = '%s:%d' % (','.join(sorted(case_meta['securities'])), case_meta['case_length'])
+    sources = case_meta.get('news_sources')
+    if sources:
+        key += ':' + hashlib.sha1(','.join(sorted(map(str, sources))).encode()).hexdigest()[:12]
+    if case is not None:
+        key += ':' + str(case)
+    return key
+
+
+class PriorCache(object):
+    """Source reliability and return covariance carried over between sessions.
+
+    One small JSON file, an entry per case_key() (pass `case` to keep cases
+    with the same tickers apart):
+
+        {"sessions": 3, "sources": {"Jack": [sum of squared errors, count], ...},
+         "returns": {"tickers": [...], "count": 449, "mean": [...], "cov": [[...]]}}
+
+    apply() (from ack_register_method) primes the engine's ReliabilityTracker,
+    return StreamingCorrelation and FactorModel with the entry as at most
+    source_weight predictions per source / returns_weight ticks, so live data
+    takes over as it comes in. update() stores the engine's end of session
+    estimates, which already blend the prior in, and save() writes the file
+    through a temporary file and os.replace, so a reader never sees half of it.
+    """
+
+    def __init__(self, path, case=None, source_weight=10, returns_weight=100):
+        self.path = path
+        self.case = case
+        self.source_weight = source_weight
+        self.returns_weight = returns_weight
+        self.entries = {}
+        self.key = None     # case_key() of the session apply() was called for
+        self.sessions = 0   # sessions already in that entry
+        self._changed = {}  # entries update() made since the last save()
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                self.entries = json.load(f)
+        except (IOError, OSError, ValueError):
+            self.entries = {}
+        return self.entries
+
+    def apply(self, engine, case_meta):
+        ## primes the engine from the entry for this case, True if there was one
+        self.key = case_key(case_meta, self.case)
+        entry = self.load().get(self.key)
+        if not entry:
+            return False
+        self.sessions = entry.get('sessions', 0)
+        engine.reliability.prime(entry.get('sources', {}), self.source_weight)
+
+        returns = entry.get('returns')
+        if returns and returns['count'] > 1 and set(returns['tickers']) == set(engine.securities):
+            order = [returns['tickers'].index(ticker) for ticker in engine.securities]
+            mean = np.asarray(returns['mean'])[order]
+            cov = np.asarray(returns['cov'])[np.ix_(order, order)]
+            count = min(returns['count'], self.returns_weight)
+            engine.rho.prime(count, mean, cov)
+            engine.factor.prime(count, mean, cov)
+        return True
+
+    def update(self, engine):
+        ## replaces the entry of the case apply() saw with the engine's current estimates
+        ## (may run several times a session, each replacing the last)
+        key = self.key
+        entry = {'sessions': self.sessions + 1,
+                 'sources': {source: list(stats) for source, stats in engine.reliability.stats().items()}}
+        rho = engine.rho
+        cov = rho.cov()
+        if rho.count > 1 and np.isfinite(cov).all():
+            entry['returns'] = {'tickers': list(engine.securities), 'count': rho.count,
+                                'mean': rho.mean.tolist(), 'cov': cov.tolist()}
+        self.entries[key] = self._changed[key] = entry
+
+    def save(self):
+        ## rereads the file first, so entries other sessions wrote since load() survive
+        self.load()
+        self.entries.update(self._changed)
+        self._changed = {}
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix='.priors', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(self.entries, f)
+            os.replace(tmp, self.path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
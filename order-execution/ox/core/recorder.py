@@ -0,0 +1,145 @@
+import ast
+import atexit
+import gzip
+import json
+import os
+import queue
+import threading
+import time
+import weakref
+
+from core.orders import OrderBatch
+
+_STOP = object()
+_OPEN = weakref.WeakSet()  # recorders not closed yet, flushed at exit
+
+
+class EventRecorder(object):
+    """Logs raw messages to a JSON lines file from a background thread.
+
+    record() only puts the message on a bounded queue; the writer thread
+    serializes whatever has queued up and writes it as one batch, gzipped if
+    the path ends in .gz or compress is set. When the queue is full messages
+    are dropped (and counted) rather than stalling the callback, unless
+    block=True. Pending messages are flushed by close() or at exit; with
+    fsync_interval set, written batches also reach the disk at least that
+    often (seconds). mode='a' adds to an existing file instead of replacing it
+    (a .gz one gets another gzip member, which read_events reads straight on).
+    """
+
+    def __init__(self, path, compress=None, max_queue=100000, batch_size=512, block=False, fsync_interval=None,
+                 mode='w'):
+        self.path = path
+        self.compress = path.endswith('.gz') if compress is None else compress
+        self.batch_size = batch_size
+        self.block = block
+        self.fsync_interval = fsync_interval
+        self.dropped = 0
+        self.written = 0
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._file = gzip.open(path, mode + 't') if self.compress else open(path, mode)
+        self._thread = threading.Thread(target=self._run, name='recorder', daemon=True)
+        self._thread.start()
+        self._closed = False
+        _OPEN.add(self)
+
+    def record(self, msg):
+        try:
+            self._queue.put(msg, block=self.block)
+        except queue.Full:
+            self.dropped += 1
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._last_sync = time.time()
+
+    def _run(self):
+        self._last_sync = time.time()
+        dirty = False
+        while True:
+            try:
+                batch = [self._queue.get(timeout=self.fsync_interval)]
+            except queue.Empty:
+                ## quiet period, make sure what was written so far is on disk
+                if dirty:
+                    self._sync()
+                    dirty = False
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = any(msg is _STOP for msg in batch)
+            if stop:
+                batch = [msg for msg in batch if msg is not _STOP]
+            if batch:
+                self._file.write(''.join(json.dumps(msg, default=str) + '\n' for msg in batch))
+                self._file.flush()
+                self.written += len(batch)
+                dirty = True
+            if self.fsync_interval is not None and dirty and (stop or time.time() - self._last_sync >= self.fsync_interval):
+                self._sync()
+                dirty = False
+            if stop:
+                return
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        _OPEN.discard(self)
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._file.close()
+
+
+def open_recorders():
+    return set(_OPEN)
+
+
+@atexit.register
+def close_all(recorders=None):
+    for recorder in list(_OPEN if recorders is None else recorders):
+        recorder.close()
+
+
+def read_events(path):
+    ## yields the messages of a recorder log (.jsonl / .gz) or an old str(msg) msglog.txt
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield ast.literal_eval(line)
+
+
+CALLBACKS = {
+    'ACK REGISTER': 'onAckRegister',
+    'MARKET UPDATE': 'onMarketUpdate',
+    'TRADER UPDATE': 'onTraderUpdate',
+    'NEWS': 'onNews',
+    'TRADE': 'onTrade',
+    'ACK MODIFY ORDERS': 'onAckModifyOrders',
+}
+
+
+def replay(path, t):
+    ## feeds a recorded session back through t's callbacks (a TradersBot or anything
+    ## with the same attributes), returns the order batches they produced
+    batches = []
+    for msg in read_events(path):
+        callback = getattr(t, CALLBACKS.get(msg.get('message_type'), ''), None)
+        if callback is None:
+            continue
+        order = OrderBatch()
+        callback(msg, order)
+        batches.append(order)
+    return batches
@@ -0,0 +1,66 @@
+import numpy as np
+
+
+class TickerRegistry(object):
+    """Dense integer ids for tickers, the Python side of ticker_t in hft/kirin.hpp.
+
+    Built from case_meta['securities'] at registration, ids follow that
+    order and never change, so per-security state can live in numpy arrays
+    indexed by id (column i is tickers[i]) and a ticker from a message is
+    one dict lookup away from its column. assign() / to_array() move a
+    {ticker: value} message field into an array without a Python loop over
+    the columns it does not mention.
+    """
+
+    __slots__ = ('tickers', 'ids')
+
+    def __init__(self, tickers=()):
+        self.tickers = []  # id -> ticker
+        self.ids = {}      # ticker -> id
+        for ticker in tickers:
+            self.add(ticker)
+
+    @classmethod
+    def from_case_meta(cls, case_meta):
+        return cls(case_meta['securities'])
+
+    def add(self, ticker):
+        ## id of ticker, given the next free one if it is new
+        i = self.ids.get(ticker)
+        if i is None:
+            i = self.ids[ticker] = len(self.tickers)
+            self.tickers.append(ticker)
+        return i
+
+    def __len__(self):
+        return len(self.tickers)
+
+    def __iter__(self):
+        return iter(self.tickers)
+
+    def __contains__(self, ticker):
+        return ticker in self.ids
+
+    def __getitem__(self, ticker):
+        return self.ids[ticker]
+
+    def ticker(self, i):
+        return self.tickers[i]
+
+    def ids_of(self, tickers):
+        tickers = list(tickers)
+        return np.fromiter((self.ids[ticker] for ticker in tickers), int, len(tickers))
+
+    def assign(self, array, mapping):
+        ## array[id] = value for every {ticker: value} in mapping, other columns untouched
+        if mapping:
+            array[self.ids_of(mapping.keys())] = np.fromiter(mapping.values(), array.dtype, len(mapping))
+        return array
+
+    def to_array(self, mapping, fill=np.nan, dtype=float):
+        ## {ticker: value} as an array in id order, fill where a ticker is missing
+        return self.assign(np.full(len(self.tickers), fill, dtype=dtype), mapping)
+
+    def to_dict(self, values):
+        ## array in id order back to {ticker: value}
+        return dict(zip(self.tickers, values))
@@ -0,0 +1,84 @@
+import heapq
+import math
+
+
+class ReliabilityTracker(object):
+    """Running RMSE of each news source's predictions.
+
+    A prediction for `new_time` is scored against the average price seen over
+    [new_time, new_time + window) and folded into its source's running sums
+    exactly once, as soon as that window has passed. Reading a source's
+    reliability is a dict lookup.
+    """
+
+    def __init__(self, start_reliability=30, window=5):
+        self.start_reliability = start_reliability
+        self.window = window
+
+        self._pending = []  # heap of (new_time, seq, source, security_idx, pred_price)
+        self._active = []   # [new_time, source, security_idx, pred_price, price_sum, n_obs]
+        self._seq = 0       # tie breaker so the heap never compares sources
+
+        self._sq_errors = {}  # source -> sum of squared errors
+        self._counts = {}     # source -> number of matured predictions
+
+    def add(self, source, security_idx, price, new_time):
+        ## registers a prediction, called from news_method
+        if source not in self._counts:
+            self._sq_errors[source] = 0.0
+            self._counts[source] = 0
+
+        heapq.heappush(self._pending, (new_time, self._seq, source, security_idx, price))
+        self._seq += 1
+
+    def prime(self, stats, weight=None):
+        ## starts each source from {source: (sum of squared errors, count)}, e.g. earlier
+        ## sessions (core/priors.py), scaled down to at most `weight` predictions
+        for source, (sq_errors, count) in stats.items():
+            if count <= 0:
+                continue
+            scale = min(1.0, weight / count) if weight is not None else 1.0
+            self._sq_errors[source] = sq_errors * scale
+            self._counts[source] = count * scale
+
+    def stats(self):
+        ## {source: (sum of squared errors, count)}, what prime() takes
+        return {source: (self._sq_errors[source], self._counts[source]) for source in self._counts}
+
+    def observe(self, time, prices):
+        ## feeds the prices (indexed by security_idx) seen at `time`, called every trader tick
+        while self._pending and self._pending[0][0] <= time:
+            new_time, _, source, security_idx, pred_price = heapq.heappop(self._pending)
+            self._active.append([new_time, source, security_idx, pred_price, 0.0, 0])
+
+        still_active = []
+        for entry in self._active:
+            new_time, source, security_idx, pred_price, price_sum, n_obs = entry
+            if time >= new_time + self.window:
+                if n_obs > 0: # avg over the window
+                    error = price_sum / n_obs - pred_price
+                    self._sq_errors[source] += error * error
+                    self._counts[source] += 1
+            else:
+                entry[4] += prices[security_idx]
+                entry[5] += 1
+                still_active.append(entry)
+        self._active = still_active
+
+    def count(self, source):
+        return self._counts.get(source, 0)
+
+    def __getitem__(self, source):
+        n = self._counts.get(source, 0)
+        if n == 0:
+            return self.start_reliability
+        return math.sqrt(self._sq_errors[source] / n) # root mean square error
+
+    def __contains__(self, source):
+        return source in self._counts
+
+    def keys(self):
+        return self._counts.keys()
+
+    def as_dict(self):
+        return {source: self[source] for source in self._counts}
@@ -0,0 +1,453 @@
+import ast
+import contextlib
+import datetime
+import json
+import math
+import os
+import sys
+import time as _time
+import traceback
+import types
+
+import numpy as np
+
+from core.orders import OrderBatch
+from core.recorder import close_all, open_recorders
+
+TICK = 0.01
+CASE_START = datetime.datetime(2019, 11, 10, 6, 30)
+
+
+def load_case(path):
+    ## a supp_*.json case definition (meta, securities with pricepaths, underlyings, news)
+    with open(path) as f:
+        return json.load(f)
+
+
+class ReplayExchange(object):
+    """Local stand-in for tradersbot.TradersBot that replays a supp_*.json case.
+
+    Every second of the case it sends a MARKET UPDATE per security, the NEWS
+    released at that second (body taken from `body_list[variant]`) and a
+    TRADER UPDATE, through the same onAckRegister / onMarketUpdate /
+    onTraderUpdate / onNews / onTrade / onAckModifyOrders callbacks the live
+    bot uses. Orders placed in a callback are matched right after it returns.
+
+    The book is synthetic: `levels` price levels a tick apart on either side
+    of the case price path, starting half the path spread away from it, with
+    level k holding volume * (1 + k * strictness) shares. Our orders take
+    liquidity from it for the rest of the second; resting orders fill at
+    their limit once the book trades through them. The path itself does not
+    react to our trading.
+
+    speedup -- case seconds per wall second; None runs as fast as possible.
+    raise_errors -- let an exception in a callback end the run, instead of
+    counting it in `errors` (last_traceback keeps the latest one) and going on.
+    """
+
+    def __init__(self, case, variant=0, speedup=None, levels=8, trader_id='trader0', raise_errors=False):
+        if isinstance(case, str):
+            case = load_case(case)
+        self.case = case
+        self.variant = variant
+        self.speedup = speedup
+        self.levels = levels
+        self.trader_id = trader_id
+        self.raise_errors = raise_errors
+
+        self.onAckRegister = None
+        self.onMarketUpdate = None
+        self.onTraderUpdate = None
+        self.onNews = None
+        self.onTrade = None
+        self.onAckModifyOrders = None
+
+        meta = case['meta']
+        self.case_length = meta['case_length']
+        self.max_open_orders = meta.get('max_open_orders', 100)
+        self.currency = meta.get('default_currency', 'USD')
+        self.endowment = meta.get('endowment', {}).get(self.currency, 0)
+
+        self.securities = list(case['securities'].keys())
+        self.paths = {tk: case['securities'][tk]['pricepath'] for tk in self.securities}
+        self.news = sorted(case['news'], key=lambda n: n['time'])
+
+        self.time = -1
+        self.cash = float(self.endowment)
+        self.positions = {tk: 0 for tk in self.securities}
+        self.open_orders = {}  # order_id -> {'ticker', 'buy', 'quantity', 'price', 'order_id'}
+        self.last_price = {tk: self.paths[tk]['price'][0] for tk in self.securities}
+        self._taken = {}       # (ticker, price) -> shares taken from the synthetic book this second
+        self._trades = []      # trades not yet sent through onTrade
+        self._next_order_id = 1
+        self._next_trade_id = 1
+        self._next_news = 0
+
+        self.n_orders = 0
+        self.n_cancels = 0
+        self.n_rejects = 0
+        self.fills = []      # every trade we were part of
+        self.latencies = []  # seconds spent inside each callback
+        self.errors = 0      # callbacks that raised
+        self.last_error = None
+        self.last_traceback = None
+
+    ## market
+
+    def _path(self, ticker, field):
+        values = self.paths[ticker][field]
+        return values[min(max(self.time, 0), len(values) - 1)]
+
+    def _synthetic_book(self, ticker):
+        price = self._path(ticker, 'price')
+        half_spread = self._path(ticker, 'spread') / 2
+        volume = self._path(ticker, 'volume')
+        strictness = self._path(ticker, 'strictness')
+
+        best_bid = math.floor((price - half_spread) / TICK + 1e-9) * TICK
+        best_ask = math.ceil((price + half_spread) / TICK - 1e-9) * TICK
+        bids, asks = [], []
+        for k in range(self.levels):
+            size = int(volume * (1 + k * strictness))
+            for side, level in ((bids, round(best_bid - k * TICK, 2)), (asks, round(best_ask + k * TICK, 2))):
+                left = size - self._taken.get((ticker, level), 0)
+                if left > 0:
+                    side.append((level, left))
+        return bids, asks
+
+    def _market_state(self, ticker):
+        bids, asks = self._synthetic_book(ticker)
+        bids, asks = dict(bids), dict(asks)
+        for o in self.open_orders.values():
+            if o['ticker'] == ticker:
+                side = bids if o['buy'] else asks
+                side[o['price']] = side.get(o['price'], 0) + o['quantity']
+        return {
+            'ticker': ticker,
+            'bids': {'%.2f' % p: q for p, q in bids.items()},
+            'asks': {'%.2f' % p: q for p, q in asks.items()},
+            'last_price': self.last_price[ticker],
+            'time': self._timestamp(),
+        }
+
+    def _timestamp(self):
+        return (CASE_START + datetime.timedelta(seconds=max(self.time, 0))).isoformat()
+
+    ## orders
+
+    def _match(self, o, passive):
+        ## fills `o` against the synthetic book, returns the quantity left
+        bids, asks = self._synthetic_book(o['ticker'])
+        left = o['quantity']
+        for level, size in (asks if o['buy'] else bids):
+            if left == 0:
+                break
+            if o['price'] is not None and (level > o['price'] if o['buy'] else level < o['price']):
+                break
+            q = min(left, size)
+            key = (o['ticker'], level)
+            self._taken[key] = self._taken.get(key, 0) + q
+            self._fill(o, q, o['price'] if passive else level)
+            left -= q
+        return left
+
+    def _fill(self, o, quantity, price):
+        ticker = o['ticker']
+        sign = 1 if o['buy'] else -1
+        self.positions[ticker] += sign * quantity
+        self.cash -= sign * quantity * price
+        self.last_price[ticker] = price
+
+        trade = {
+            'trade_id': self._next_trade_id, 'ticker': ticker, 'price': price, 'quantity': quantity,
+            'buy': o['buy'], 'buy_order_id': o['order_id'] if o['buy'] else 0,
+            'sell_order_id': 0 if o['buy'] else o['order_id'], 'time': self._timestamp(),
+        }
+        self._next_trade_id += 1
+        self.fills.append(trade)
+        self._trades.append(trade)
+
+    def _check(self, o):
+        spec = self.case['securities'].get(o['ticker'])
+        if spec is None or not spec.get('tradeable', True):
+            return 'unknown or untradeable ticker'
+        if not isinstance(o['quantity'], int) or isinstance(o['quantity'], bool):
+            return 'quantity must be an int'  # the live exchange can't serialize anything else either
+        if not spec.get('minimum_order_size', 1) <= o['quantity'] <= spec.get('maximum_order_size', o['quantity']):
+            return 'quantity outside order size limits'
+        if o['price'] is not None and not o['price'] > 0:
+            return 'bad price'
+        if len(self.open_orders) >= self.max_open_orders:
+            return 'too many open orders'
+        return None
+
+    def _process(self, batch):
+        if not len(batch):
+            return
+        ack_orders, ack_cancels = [], {}
+
+        for c in batch.cancels:
+            self.n_cancels += 1
+            order_id = int(c['order_id'])
+            ack_cancels[order_id] = None if self.open_orders.pop(order_id, None) is not None else 'order not found'
+
+        for o in batch.orders:
+            self.n_orders += 1
+            error = self._check(o)
+            if error is not None:
+                self.n_rejects += 1
+                ack_orders.append(dict(o, error=error))
+                continue
+
+            o = dict(o, order_id=self._next_order_id)
+            self._next_order_id += 1
+            if o['price'] is not None:
+                o['price'] = round(float(o['price']), 2)
+            ack_orders.append(dict(o))
+
+            left = self._match(o, passive=False)
+            if left > 0 and o['price'] is not None:
+                o['quantity'] = left
+                self.open_orders[o['order_id']] = o
+
+        self._dispatch(self.onAckModifyOrders, {
+            'message_type': 'ACK MODIFY ORDERS', 'orders': ack_orders, 'cancels': ack_cancels,
+        })
+        self._flush_trades()
+
+    def _cross_resting(self, ticker):
+        for order_id, o in list(self.open_orders.items()):
+            if o['ticker'] != ticker:
+                continue
+            o['quantity'] = self._match(o, passive=True)
+            if o['quantity'] == 0:
+                del self.open_orders[order_id]
+
+    def _flush_trades(self):
+        if self._trades:
+            trades, self._trades = self._trades, []
+            self._dispatch(self.onTrade, {'message_type': 'TRADE', 'trades': trades})
+
+    def _dispatch(self, callback, msg):
+        if callback is None:
+            return
+        batch = OrderBatch()
+        start = _time.perf_counter()
+        try:
+            callback(msg, batch)
+        except Exception as e:
+            ## like the live client, a failing callback loses its orders but not the session
+            self.errors += 1
+            self.last_error = '%s: %s' % (type(e).__name__, e)
+            self.last_traceback = traceback.format_exc()
+            if self.raise_errors:
+                raise
+            return
+        finally:
+            self.latencies.append(_time.perf_counter() - start)
+        self._process(batch)
+
+    ## messages
+
+    def pnl(self):
+        marks = sum(q * self._path(tk, 'price') for tk, q in self.positions.items())
+        return self.cash + marks - self.endowment
+
+    def _trader_state(self):
+        pnl = self.pnl()
+        return {
+            'cash': {self.currency: self.cash}, 'pnl': {self.currency: pnl}, 'default_pnl': pnl,
+            'positions': dict(self.positions),
+            'open_orders': {str(order_id): dict(o) for order_id, o in self.open_orders.items()},
+            'time': self._timestamp(), 'trader_id': self.trader_id, 'subscriptions': {},
+            'total_fees': 0, 'total_rebates': 0, 'total_fines': 0,
+        }
+
+    def _ack_register(self):
+        securities = {}
+        for tk, spec in self.case['securities'].items():
+            securities[tk] = {
+                'starting_price': self.paths[tk]['price'][0], 'tradeable': spec.get('tradeable', True),
+                'precision': spec.get('maximum_decimal_digits', 2), 'dark': False,
+                'invisible': spec.get('invisible', False), 'underlyings': spec.get('underlyings', {tk: 1}),
+            }
+        case_meta = {
+            'securities': securities, 'case_length': self.case_length, 'speedup': self.speedup or 0,
+            'default_currency': self.currency, 'currencies': {self.currency: {'name': self.currency, 'limit': 0}},
+            'underlyings': self.case.get('underlyings', {}), 'news_sources': None,
+        }
+        return {
+            'message_type': 'ACK REGISTER', 'case_meta': case_meta, 'elapsed_time': -1,
+            'market_states': {tk: self._market_state(tk) for tk in self.securities},
+            'trader_state': self._trader_state(),
+        }
+
+    def _news(self, news):
+        body = news['body_list'][self.variant] if 'body_list' in news else news['body']
+        return {'message_type': 'NEWS', 'news': {
+            'headline': news['headline'], 'source': news['source'], 'body': str(body),
+            'time': news['time'], 'price': 0,
+        }}
+
+    def start(self):
+        ## ACK REGISTER, time -1
+        self.time = -1
+        self._next_news = 0
+        self._dispatch(self.onAckRegister, self._ack_register())
+
+    def step(self, t):
+        ## everything the exchange sends during second t of the case
+        self.time = t
+        self._taken.clear()
+
+        for tk in self.securities:
+            self._cross_resting(tk)
+        self._flush_trades()
+
+        for tk in self.securities:
+            self._dispatch(self.onMarketUpdate, {
+                'message_type': 'MARKET UPDATE', 'market_state': self._market_state(tk), 'elapsed_time': t,
+            })
+
+        while self._next_news < len(self.news) and self.news[self._next_news]['time'] <= t:
+            self._dispatch(self.onNews, self._news(self.news[self._next_news]))
+            self._next_news += 1
+
+        self._dispatch(self.onTraderUpdate, {'message_type': 'TRADER UPDATE', 'trader_state': self._trader_state()})
+
+    def run(self):
+        self.start()
+        for t in range(self.case_length + 1):
+            wall_start = _time.perf_counter()
+            self.step(t)
+            if self.speedup:
+                _time.sleep(max(0.0, 1.0 / self.speedup - (_time.perf_counter() - wall_start)))
+        return self.results()
+
+    def results(self):
+        latencies = np.array(self.latencies) if self.latencies else np.zeros(1)
+        return {
+            'pnl': self.pnl(),
+            'positions': dict(self.positions),
+            'orders': self.n_orders,
+            'cancels': self.n_cancels,
+            'rejects': self.n_rejects,
+            'fills': len(self.fills),
+            'volume': sum(trade['quantity'] for trade in self.fills),
+            'errors': self.errors,
+            'last_error': self.last_error,
+            'last_traceback': self.last_traceback,
+            'latency_mean': float(latencies.mean()),
+            'latency_p99': float(np.percentile(latencies, 99)),
+            'latency_max': float(latencies.max()),
+        }
+
+
+## constants every offline run overrides where a bot assigns them: no state shared between runs
+OFFLINE_PARAMS = {'PRIORS': None}
+
+
+def _compile_bot(path, params, defaults=None):
+    ## swaps the values of module level `NAME = ...` assignments for the ones in params
+    ## (and in defaults, which a bot need not assign)
+    with open(path) as f:
+        tree = ast.parse(f.read(), path)
+    missing = set(params)
+    values = dict(defaults or {}, **params)
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            name = node.targets[0].id
+            if name in values:
+                node.value = ast.copy_location(ast.Constant(values[name]), node.value)
+                missing.discard(name)
+    if missing:
+        raise KeyError("%s does not assign %s" % (path, ', '.join(sorted(missing))))
+    return compile(ast.fix_missing_locations(tree), path, 'exec')
+
+
+def exec_bot(bot, make_bot, params=None, workdir=None, quiet=True):
+    """Runs a bot script with tradersbot.TradersBot swapped for make_bot.
+
+    make_bot(host, id, password) returns the object the script attaches its
+    callbacks to and calls run() on. `params` overrides module level
+    constants where the script assigns them (e.g. MIN_RELIABILITY=15), so
+    tuning doesn't need a copy of the file. OFFLINE_PARAMS apply unless
+    params set them. Files the bot writes (msglog.txt, history.csv, ...) go
+    to `workdir`, default the current dir.
+    """
+    bot = os.path.abspath(bot)
+    code = _compile_bot(bot, params or {}, OFFLINE_PARAMS)
+
+    fake = types.ModuleType('tradersbot')
+    fake.TradersBot = make_bot
+    fake.TradersOrder = OrderBatch
+
+    saved_module = sys.modules.get('tradersbot')
+    saved_argv = sys.argv
+    saved_cwd = os.getcwd()
+    bot_dir = os.path.dirname(bot)
+    if bot_dir not in sys.path:
+        sys.path.insert(0, bot_dir)
+
+    sys.modules['tradersbot'] = fake
+    sys.argv = [bot, '127.0.0.1', 'trader0', 'trader0']  # finalbot reads host / id / password from argv
+    recorders = open_recorders()
+    try:
+        if workdir is not None:
+            os.chdir(workdir)
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull if quiet else sys.stdout):
+            exec(code, {'__name__': '__main__', '__file__': bot})
+    finally:
+        close_all(open_recorders() - recorders)  # msglog / trade journal of this run, before leaving workdir
+        os.chdir(saved_cwd)
+        sys.argv = saved_argv
+        if saved_module is None:
+            del sys.modules['tradersbot']
+        else:
+            sys.modules['tradersbot'] = saved_module
+
+
+def run_bot(bot, case, variant=0, params=None, speedup=None, workdir=None, quiet=True, raise_errors=False):
+    """Runs a bot script against a replayed case, returns ReplayExchange.results().
+
+    `case` is a path or an already loaded case dict; raise_errors makes the
+    first exception in a callback propagate out of here (see ReplayExchange).
+    The rest is as for exec_bot.
+    """
+    if isinstance(case, str):
+        case = load_case(case)  # before moving to workdir, the path may be relative
+    exchanges = []
+
+    def make_exchange(*args, **kwargs):
+        exchange = ReplayExchange(case, variant=variant, speedup=speedup, raise_errors=raise_errors)
+        exchanges.append(exchange)
+        return exchange
+
+    exec_bot(bot, make_exchange, params, workdir, quiet)
+    return exchanges[0].results()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="replay a supp_*.json case against a bot script")
+    parser.add_argument('bot')
+    parser.add_argument('case')
+    parser.add_argument('--variant', type=int, default=0, help="index into each news body_list")
+    parser.add_argument('--speedup', type=float, default=None, help="case seconds per wall second (default: no waiting)")
+    parser.add_argument('--param', action='append', default=[], metavar='NAME=VALUE')
+    parser.add_argument('--verbose', action='store_true', help="show the bot's prints")
+    parser.add_argument('--raise-errors', action='store_true', help="stop at the first exception in a callback")
+    args = parser.parse_args()
+
+    params = {}
+    for item in args.param:
+        name, value = item.split('=', 1)
+        params[name] = ast.literal_eval(value)
+
+    results = run_bot(args.bot, args.case, variant=args.variant, params=params,
+                      speedup=args.speedup, quiet=not args.verbose, raise_errors=args.raise_errors)
+    last_traceback = results.pop('last_traceback')
+    print(json.dumps(results, indent=2))
+    if last_traceback:
+        print("%d callbacks raised, the last one:\n%s" % (results['errors'], last_traceback), file=sys.stderr)
@@ -0,0 +1,150 @@
+import csv
+import itertools
+import os
+import random
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from core.replay import load_case, run_bot
+
+## per worker state, filled in by _init_worker so case files are parsed once per process
+_CASES = {}
+
+
+def case_variants(case):
+    ## number of news body_list variants a case can be replayed with
+    return min(len(news['body_list']) for news in case['news'])
+
+
+def grid(**values):
+    ## grid(MIN_RELIABILITY=[5, 10], EDGE_DEMANDED=[1, 2]) -> every combination as a dict
+    names = sorted(values)
+    return [dict(zip(names, combo)) for combo in itertools.product(*(values[name] for name in names))]
+
+
+def random_search(space, n, seed=None):
+    """n random parameter sets from `space`.
+
+    A list is sampled from, a (low, high) tuple is drawn uniformly (as an int
+    if both ends are ints).
+    """
+    rng = random.Random(seed)
+    param_sets = []
+    for _ in range(n):
+        params = {}
+        for name, choices in sorted(space.items()):
+            if isinstance(choices, tuple):
+                low, high = choices
+                if isinstance(low, int) and isinstance(high, int):
+                    params[name] = rng.randint(low, high)
+                else:
+                    params[name] = rng.uniform(low, high)
+            else:
+                params[name] = rng.choice(choices)
+        param_sets.append(params)
+    return param_sets
+
+
+def _init_worker(case_paths):
+    for path in case_paths:
+        _CASES[path] = load_case(path)
+
+
+def _run_one(job):
+    bot, params, case_path, variant, raise_errors = job
+    ## a fresh dir per job: nothing a bot writes (msglog, history, journals) reaches the next one
+    workdir = tempfile.mkdtemp(prefix='sweep-')
+    try:
+        results = run_bot(bot, _CASES[case_path], variant=variant, params=params, workdir=workdir,
+                          raise_errors=raise_errors)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    row = {'case': os.path.basename(case_path), 'variant': variant}
+    row.update(params)
+    row.update((k, v) for k, v in results.items() if k != 'positions')
+    return row
+
+
+def sweep(bot, param_sets, case_paths, variants=None, processes=None, raise_errors=False):
+    """Replays every parameter set on every case / news variant across a process pool.
+
+    variants -- body_list indices to replay, default all of them.
+    raise_errors -- stop the sweep at the first exception in a bot callback
+    (otherwise it is counted in the row's errors, with its last_traceback).
+    Returns one row (dict) per run with the case, variant, parameters and the
+    replay results (pnl, fills, rejects, latency stats, ...).
+    """
+    case_paths = [os.path.abspath(path) for path in case_paths]
+    bot = os.path.abspath(bot)
+
+    jobs = []
+    for path in case_paths:
+        case_range = range(case_variants(load_case(path))) if variants is None else variants
+        for params in param_sets:
+            for variant in case_range:
+                jobs.append((bot, params, path, variant, raise_errors))
+
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=(case_paths,)) as pool:
+        return list(pool.map(_run_one, jobs, chunksize=max(1, len(jobs) // (4 * (processes or os.cpu_count() or 1)))))
+
+
+def summarize(rows, names):
+    ## one row per parameter set: mean / std / worst pnl over cases and variants, total fills, latency
+    groups = {}
+    for row in rows:
+        groups.setdefault(tuple(row[name] for name in names), []).append(row)
+
+    summary = []
+    for key, group in groups.items():
+        pnl = np.array([row['pnl'] for row in group])
+        summary.append(dict(zip(names, key), runs=len(group), pnl_mean=float(pnl.mean()), pnl_std=float(pnl.std()),
+                            pnl_min=float(pnl.min()), fills=sum(row['fills'] for row in group),
+                            rejects=sum(row['rejects'] for row in group),
+                            errors=sum(row['errors'] for row in group),
+                            latency_p99=max(row['latency_p99'] for row in group)))
+    summary.sort(key=lambda row: -row['pnl_mean'])
+    return summary
+
+
+def write_table(rows, path):
+    fields = []
+    for row in rows:
+        fields.extend(k for k in row if k not in fields)
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+if __name__ == '__main__':
+    import argparse
+    import ast
+    import glob
+
+    parser = argparse.ArgumentParser(description="sweep bot constants over the replay cases")
+    parser.add_argument('bot')
+    parser.add_argument('--cases', nargs='+', default=sorted(glob.glob('../supp/supp_*.json')))
+    parser.add_argument('--param', action='append', default=[], metavar='NAME=V1,V2,...')
+    parser.add_argument('--samples', type=int, default=None, help="random sets from the grid instead of all of it")
+    parser.add_argument('--variants', type=int, nargs='+', default=None)
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--out', default='sweep.csv')
+    parser.add_argument('--raise-errors', action='store_true', help="stop at the first exception in a bot callback")
+    args = parser.parse_args()
+
+    space = {}
+    for item in args.param:
+        name, values = item.split('=', 1)
+        space[name] = [ast.literal_eval(v) for v in values.split(',')]
+
+    param_sets = grid(**space) if args.samples is None else random_search(space, args.samples, args.seed)
+    rows = sweep(args.bot, param_sets, args.cases, variants=args.variants, processes=args.processes,
+                 raise_errors=args.raise_errors)
+    write_table(rows, args.out)
+
+    for row in summarize(rows, sorted(space))[:10]:
+        print(row)
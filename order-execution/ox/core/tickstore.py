@@ -0,0 +1,206 @@
+import json
+import os
+
+import numpy as np
+
+from core.recorder import read_events
+from core.registry import TickerRegistry
+
+## one row per security per MARKET UPDATE
+TOP_DTYPE = np.dtype([
+    ('seq', 'i8'), ('time', 'f8'), ('security', 'i2'),
+    ('bid', 'f8'), ('ask', 'f8'), ('bid_size', 'f8'), ('ask_size', 'f8'), ('last_price', 'f8'),
+])
+## one row per price level per MARKET UPDATE, side is 1 for bids and -1 for asks
+DEPTH_DTYPE = np.dtype([
+    ('seq', 'i8'), ('time', 'f8'), ('security', 'i2'), ('side', 'i1'), ('price', 'f8'), ('size', 'f8'),
+])
+## one row per NEWS, source indexes TickStore.sources
+NEWS_DTYPE = np.dtype([
+    ('seq', 'i8'), ('time', 'f8'), ('security', 'i2'), ('source', 'i2'), ('new_time', 'f8'), ('price', 'f8'),
+])
+
+TABLES = ('top', 'depth', 'news', 'trader')
+
+
+def read_messages(path):
+    ## yields the messages of a msglog.txt (str(msg) per line) or a recorder log
+    return read_events(path)
+
+
+def _trader_dtype(n):
+    return np.dtype([
+        ('seq', 'i8'), ('time', 'f8'), ('cash', 'f8'), ('pnl', 'f8'), ('open_orders', 'i4'),
+        ('positions', 'i8', (n,)),
+    ])
+
+
+def _amount(value):
+    ## cash / pnl come as {'USD': x}
+    if isinstance(value, dict):
+        return float(sum(value.values()))
+    return float(value)
+
+
+class TickStoreWriter(object):
+    """Splits a tradersbot message stream into columnar tables.
+
+    Feed it messages with add() (straight from the callbacks, or from
+    read_messages), then save() writes one .npy per table plus meta.json.
+    Messages without an elapsed_time get the last one seen. NEWS whose
+    headline isn't "<ticker> <time>" (or whose body isn't a price) is
+    skipped and counted in `skipped_news`, rather than ending the conversion.
+    """
+
+    def __init__(self):
+        self.registry = TickerRegistry()
+        self.securities = self.registry.tickers
+        self.index = self.registry.ids
+        self.sources = []
+        self.source_index = {}
+        self.case_meta = None
+
+        self.seq = 0
+        self.time = -1.0
+        self.skipped_news = 0
+        self._top = []
+        self._depth = []
+        self._news = []
+        self._trader = []
+
+    def _security(self, ticker):
+        return self.registry.add(ticker)
+
+    def _source(self, source):
+        if source not in self.source_index:
+            self.source_index[source] = len(self.sources)
+            self.sources.append(source)
+        return self.source_index[source]
+
+    def add(self, msg):
+        if 'elapsed_time' in msg:
+            self.time = float(msg['elapsed_time'])
+
+        message_type = msg.get('message_type')
+        if message_type == 'ACK REGISTER':
+            self.case_meta = {k: v for k, v in msg['case_meta'].items() if k != 'securities'}
+            for ticker in msg['case_meta']['securities']:
+                self._security(ticker)
+            for market_state in msg.get('market_states', {}).values():
+                self._market_state(market_state)
+            if 'trader_state' in msg:
+                self._trader_state(msg['trader_state'])
+        elif message_type == 'MARKET UPDATE':
+            self._market_state(msg['market_state'])
+        elif message_type == 'TRADER UPDATE':
+            self._trader_state(msg['trader_state'])
+        elif message_type == 'NEWS':
+            self._news_item(msg['news'])
+
+        self.seq += 1
+
+    def _market_state(self, market_state):
+        i = self._security(market_state['ticker'])
+        bid = ask = bid_size = ask_size = np.nan
+
+        for price, size in market_state['bids'].items():
+            price = float(price)
+            self._depth.append((self.seq, self.time, i, 1, price, size))
+            if not price <= bid:
+                bid, bid_size = price, size
+        for price, size in market_state['asks'].items():
+            price = float(price)
+            self._depth.append((self.seq, self.time, i, -1, price, size))
+            if not price >= ask:
+                ask, ask_size = price, size
+
+        self._top.append((self.seq, self.time, i, bid, ask, bid_size, ask_size, market_state['last_price']))
+
+    def _news_item(self, news):
+        try:
+            ticker, new_time = news['headline'].split()
+            new_time, price = float(new_time), float(news['body'])
+            source = news['source']
+        except (KeyError, TypeError, ValueError, AttributeError):
+            self.skipped_news += 1
+            return
+        self._news.append((self.seq, self.time, self._security(ticker), self._source(source), new_time, price))
+
+    def _trader_state(self, trader_state):
+        positions = {self._security(ticker): q for ticker, q in trader_state['positions'].items()}
+        self._trader.append((self.seq, self.time, _amount(trader_state['cash']), _amount(trader_state['pnl']),
+                             len(trader_state['open_orders']), positions))
+
+    def tables(self):
+        n = len(self.securities)
+        trader = np.zeros(len(self._trader), dtype=_trader_dtype(n))
+        for row, (seq, time, cash, pnl, open_orders, positions) in zip(trader, self._trader):
+            row['seq'], row['time'], row['cash'], row['pnl'], row['open_orders'] = seq, time, cash, pnl, open_orders
+            for i, q in positions.items():
+                row['positions'][i] = q
+        return {
+            'top': np.array(self._top, dtype=TOP_DTYPE),
+            'depth': np.array(self._depth, dtype=DEPTH_DTYPE),
+            'news': np.array(self._news, dtype=NEWS_DTYPE),
+            'trader': trader,
+        }
+
+    def save(self, out_dir):
+        if not os.path.isdir(out_dir):
+            os.makedirs(out_dir)
+        for name, table in self.tables().items():
+            np.save(os.path.join(out_dir, name + '.npy'), table)
+        with open(os.path.join(out_dir, 'meta.json'), 'w') as f:
+            json.dump({'securities': self.securities, 'sources': self.sources, 'case_meta': self.case_meta}, f)
+
+
+def convert(log, out_dir):
+    ## log is a path to a message log or any iterable of messages
+    writer = TickStoreWriter()
+    for msg in (read_messages(log) if isinstance(log, str) else log):
+        writer.add(msg)
+    writer.save(out_dir)
+    return writer
+
+
+class TickStore(object):
+    """A converted session, tables memory mapped from out_dir.
+
+    top / depth / news / trader are numpy structured arrays (see the *_DTYPE
+    definitions); `security` and `source` columns index `securities` and
+    `sources`.
+    """
+
+    def __init__(self, path, mmap=True):
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        self.securities = meta['securities']
+        self.index = {security: i for i, security in enumerate(self.securities)}
+        self.sources = meta['sources']
+        self.case_meta = meta['case_meta']
+        for name in TABLES:
+            setattr(self, name, np.load(os.path.join(path, name + '.npy'), mmap_mode='r' if mmap else None))
+
+    def top_of_book(self, security):
+        return self.top[self.top['security'] == self.index[security]]
+
+    def depth_of(self, security):
+        return self.depth[self.depth['security'] == self.index[security]]
+
+    def news_for(self, security):
+        return self.news[self.news['security'] == self.index[security]]
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="convert a message log into .npy tick tables")
+    parser.add_argument('log')
+    parser.add_argument('out_dir')
+    args = parser.parse_args()
+
+    writer = convert(args.log, args.out_dir)
+    print("wrote %d messages: %s" % (writer.seq, ', '.join(
+        '%s %d rows' % (name, len(table)) for name, table in writer.tables().items())))
+    if writer.skipped_news:
+        print("skipped %d news items with an unreadable headline / body" % writer.skipped_news)
@@ -5,7 +5,9 @@ import sklearn as sk
 import pandas as pd
 import pickle
 
-from copy import deepcopy
+from core.engine import StrategyEngine
+from core.instrument import instrument
+from core.order_manager import OrderManager
 
 ###########################################################
 # Make sure you run pip install tradersbot before running #
@@ -20,6 +22,7 @@ ORDER_LIMIT = 100
 
 # Hyperparameters
 START_RELIABILITY = 30
+PRIORS = 'priors.json' # reliability / return stats carried between sessions (core/priors.py), None for off
 MIN_RELIABILITY = 10
 MAX_TRADE_SZ = 200
 
@@ -28,133 +31,46 @@ DEFAULT_CONFIDENCE = 5
 MAX_DIFFERENCE = 20
 
 # Variables
-HISTORY = [] # stores all historical values, updated every 0.5 seconds
-CURRENT = {
-    'POSITIONS'     : {}, # stores current positions
-    'OPEN_ORDERS'   : {}, # stores current open orders [no clue how these are stored lol]
-    'PRICE'         : {}, # stores current price of each security
-    'BIDS'          : {}, # stores current best bids
-    'OFFERS'        : {}, # stores current best offers
-    'PREDS'         : {}, # stores active predictions (sorted by time) in (price, time, source) form
-    'TIME'          : 0, 
-    'LAST_NEWS_TIME': -10 # stores last time news came out
-}
-SOURCES = {} # stores all preds sorted by sources in (security, price, new_time) form
-
-# logging
-log_file = 'msglog.txt'
-log_obj = open(log_file, "w")
-
-# Initializes the prices
-# Initializes prediction dictionary
-def ack_register_method(msg, order):
-    log_obj.write(str(msg) + '\n')
-    global CURRENT
-    security_dict = msg['case_meta']['securities']
-    for security in security_dict.keys():
-        if not(security_dict[security]['tradeable']): 
-            continue
-        CURRENT['PRICE'][security] = security_dict[security]['starting_price']
-
-    for security in security_dict:
-        CURRENT['PREDS'][security] = [];
+QUOTES = OrderManager(max_open_orders=ORDER_LIMIT, size_step=50) # quotes we want resting, only the diff gets sent
+# prices, positions, preds, history and source reliability live in the StrategyEngine below
 
+def on_register(engine, order):
     print("Welcome to the exchange!!")
 
 # Updates latest price and time
-def market_update_method(msg, order):
-    log_obj.write(str(msg) + '\n')
-    global CURRENT, time
-
-    security = msg['market_state']['ticker']
-
-    # Gets the price by averaging the highest bid (or buy order)
-    # and lowest ask (or sell order)
-    max_bid = -1;
-    min_ask = -1;
-    for bid in msg['market_state']['bids']:
-        if float(bid) > max_bid:
-            max_bid = float(bid);
-    
-    for ask in msg['market_state']['asks']:
-        if min_ask == -1 or float(ask) < min_ask:
-            min_ask = float(ask);
-
-    # update CURRENT data
-    if min_ask == -1 or max_bid == -1:
-        CURRENT['OFFERS'][security] = None
-        CURRENT['BIDS'][security] = None
-        CURRENT['PRICE'][security] = msg['market_state']['last_price'];
-    else:
-        CURRENT['OFFERS'][security] = min_ask
-        CURRENT['BIDS'][security] = max_bid
-        CURRENT['PRICE'][security] = (min_ask + max_bid) / 2;
-
-    # Sets the time
-    CURRENT['TIME'] = msg['elapsed_time']
-
-    _info_arb_trades(order)
-    # _momentum_trades(order)
-    # _exit_old_trades(order)
+def on_market(engine, security, order):
+    _info_arb_trades(engine, QUOTES)
+    QUOTES.sync(engine.open_orders, order)
+    # _momentum_trades(engine, order)
+    # _exit_old_trades(engine, order)
 
 # Checks to make sure does not violate position limits or order limit
-def trader_update_method(msg, order):
-    log_obj.write(str(msg) + '\n')
-    global CURRENT, HISTORY
+def on_trader(engine, order):
+    # _momentum_trades(engine, order)
+    _info_arb_trades(engine, QUOTES)
+    QUOTES.sync(engine.open_orders, order) # keeps unchanged quotes (and their queue spot), cancels the rest
+    _exit_old_trades(engine, order)
 
-    HISTORY.append(deepcopy(CURRENT)) # make a copy of historical data
+def on_news(engine, security, price, new_time, source, order):
+    _info_arb_trades(engine, QUOTES)
+    QUOTES.sync(engine.open_orders, order)
 
-    CURRENT['POSITIONS'] = msg['trader_state']['positions']
-    CURRENT['OPEN_ORDERS'] = msg['trader_state']['open_orders']
-
-    _cancel_open_orders(order)
-    # _momentum_trades(order)
-    _info_arb_trades(order)
-    _exit_old_trades(order)
-
-    historical_prices = _get_historical_prices()[0]
-    np.savetxt("history.csv", historical_prices, delimiter=",")
-    pickle.dump(HISTORY, open("history.pkl", 'wb'))
-
-def news_method(msg, order):
-    log_obj.write(str(msg) + '\n')
-    global CURRENT, SOURCES
-
-    info = msg['news']['headline'].split()
-    security = info[0]
-    new_time = float(info[1])
-    price = float(msg['news']['body'])
-    source = msg['news']['source']
-
-    CURRENT['PREDS'][security].append((price, new_time, source))
-    if source in SOURCES.keys():
-        SOURCES[source].append((security, price, new_time))
-    else:
-        SOURCES[source] = [(security, price, new_time)]
-
-    ## update new "news" time
-    CURRENT['LAST_NEWS_TIME'] = CURRENT['TIME']
-
-    _info_arb_trades(order)
-
-def _update_fairs():
-    reliability = _estimate_reliability()
-    rho, stdevs = _estimate_rho() 
+def _update_fairs(engine):
+    reliability = engine.reliability
+    rho, stdevs = _estimate_rho(engine)
 
     ## TODO: use this info from abov
 
     fairs = {}
     market_impact = [] # (stores impact in stdevs, and confidence)
 
-    for security in CURRENT['POSITIONS'].keys():
-        curr_bid = CURRENT['BIDS'][security]
-        curr_ask = CURRENT['OFFERS'][security]
-        curr_price = CURRENT['PRICE'][security]
+    for i, security in enumerate(engine.securities):
+        curr_price = engine.price[i]
 
         fair_pred = None
         closest_time = 100000 # effective INF
         closest_source = None
-        for price, new_time, source in CURRENT['PREDS'][security]: # find closest, good pred
+        for price, new_time, source in engine.predictions.for_security(i): # find closest, good pred
             if new_time <= closest_time and reliability[source] <= MIN_RELIABILITY:
                 fair_pred = price
                 closest_time = new_time
@@ -165,159 +81,113 @@ def _update_fairs():
         else:
             ci = reliability[closest_source]
             fairs[security] = (fair_pred, ci)
-            market_impact.append(((fair_pred - curr_price) / stdevs[security], ci / stdevs[security]))
-
-        # print("Computing Fair for ", security)
-        # print("PREDS:", CURRENT['PREDS'][security])
-        # print(fairs[security])
-        # print("CURRENT BBO", CURRENT['BIDS'][security], CURRENT['OFFERS'][security])
+            market_impact.append(((fair_pred - curr_price) / stdevs[i], ci / stdevs[i]))
 
-    if CURRENT['TIME'] > 50:
+    if engine.time > 50:
         print("RHO is", rho)
         best_guess_market_impact = sum(el[0] for el in market_impact) / len(market_impact) # in stdevs
         best_guess_market_ci = sum(el[1] for el in market_impact) / len(market_impact)
 
         print("MARKET IMPACT (stdevs) is ", best_guess_market_impact)
 
-        for security in CURRENT['POSITIONS'].keys():
-            beta_pred = curr_price + best_guess_market_impact * rho * stdevs[security]
-            beta_ci = best_guess_market_ci * rho * stdevs[security]
-            
+        for i, security in enumerate(engine.securities):
+            beta_pred = curr_price + best_guess_market_impact * rho * stdevs[i]
+            beta_ci = best_guess_market_ci * rho * stdevs[i]
+
             if fairs[security][1] == DEFAULT_CONFIDENCE: # no accurate pred
                 fairs[security] = (beta_pred, beta_ci)
 
     return fairs
 
-def _get_historical_prices():
-    times = []
-    data = np.empty((len(HISTORY), len(CURRENT['POSITIONS'].keys()))) # (security, time)
-    for i, entry in enumerate(HISTORY):
-        times.append(entry['TIME'])
-        for j, security in enumerate(CURRENT['POSITIONS'].keys()):
-            data[i,j] = entry['PRICE'][security]
-
-    return np.array(data), np.array(times)
-
-def _estimate_reliability():
-    ## measures the mean square error of predictions made by this individual
-    reliability = {}
-    data, times = _get_historical_prices()
-    for source in SOURCES.keys():
-        past_preds = SOURCES[source]
-        errors = []
-        for security, pred_price, new_time in past_preds:
-            security_idx = list(CURRENT['POSITIONS'].keys()).index(security)
-            if new_time < CURRENT['TIME']:
-                time_begin = np.searchsorted(times, new_time)
-                time_end = np.searchsorted(times, min(new_time+5, CURRENT['TIME']))
-                real_price = data[time_begin:time_end, security_idx].mean() # avg over 5 sec
-                errors.append(real_price - pred_price)
-        if len(errors) == 0:
-            reliability[source] = START_RELIABILITY
-        else:
-            reliability[source] = np.sqrt((np.array(errors) ** 2).mean()) # mean square error
+def _estimate_rho(engine):
+    ## running estimates over all of the history (see core/correlation.py)
+    rho = engine.rho.rho()
+    stdevs = engine.price_stats.std()
 
-    return reliability
-    
-def _estimate_rho():
-    data, times = _get_historical_prices()
-    returns = data[1:,:] - data[:-1,:]
-    corr = np.corrcoef(returns.T)
-    rho = np.median(corr.reshape(-1))
+    return rho, stdevs
 
-    stdevs = {}
-    for security in CURRENT['POSITIONS'].keys():
-        stdevs[security] = np.std([entry["PRICE"][security] for entry in HISTORY])
-
-    return rho, stdevs 
-
-def _info_arb_trades(order):
+def _info_arb_trades(engine, order):
     ## makes trades that are good to fair if there is still position limit / order limit
 
-    # if len(CURRENT['OPEN_ORDERS']) > ORDER_LIMIT:
+    # if len(engine.open_orders) > ORDER_LIMIT:
     #     print("OVER ORDER_LIMIT")
     #     return; ## TODO: change this so that it actively cancels stale open orders
 
-    new_fairs = _update_fairs() # dict with (security: (bid, ask))
-    # print(CURRENT['TIME'], new_fairs)
+    new_fairs = _update_fairs(engine) # dict with (security: (bid, ask))
 
-    for security in CURRENT['POSITIONS'].keys():
+    for i, security in enumerate(engine.securities):
         fair, ci = new_fairs[security]
         edge = ci / 2
 
         fair_bid = fair - edge
         fair_ask = fair + edge
-        curr_bid = CURRENT['BIDS'][security]
-        curr_ask = CURRENT['OFFERS'][security]
+        curr_bid = engine.bid[i]
+        curr_ask = engine.ask[i]
 
         if ci < DEFAULT_CONFIDENCE: ## only if we have reliable info
             if curr_bid > fair_ask:
-                quant = min(MAX_TRADE_SZ, POS_LIMIT + CURRENT['POSITIONS'][security])
+                quant = int(min(MAX_TRADE_SZ, POS_LIMIT + engine.positions[i]))
                 if quant > 10:
                     order.addSell(security, quantity=quant, price=fair_ask)
             if curr_ask < fair_bid:
-                quant = min(MAX_TRADE_SZ, POS_LIMIT - CURRENT['POSITIONS'][security])
+                quant = int(min(MAX_TRADE_SZ, POS_LIMIT - engine.positions[i]))
                 if quant > 10:
                     order.addBuy(security, quantity=quant, price=fair_bid)
 
-def _momentum_trades(order):
+def _momentum_trades(engine, order):
     THRESHOLD = 2.0
 
-    data, times = _get_historical_prices()
-    if (CURRENT['TIME'] - CURRENT['LAST_NEWS_TIME'] >= 0):
-        if (CURRENT['TIME'] - CURRENT['LAST_NEWS_TIME'] <= 5):
-            for j, security in enumerate(CURRENT['POSITIONS'].keys()):
-                news_idx = np.searchsorted(times, CURRENT['LAST_NEWS_TIME'])
-                net_change_in_price =  CURRENT['PRICE'][security] - HISTORY[news_idx]['PRICE'][security]
-                
+    history = engine.history
+    if (engine.time - engine.last_news_time >= 0):
+        if (engine.time - engine.last_news_time <= 5):
+            news_idx = history.row_at(engine.last_news_time)
+            for j, security in enumerate(engine.securities):
+                net_change_in_price = engine.price[j] - history.price[news_idx, j]
+
                 if (net_change_in_price > THRESHOLD):
-                    print(CURRENT['TIME'], security, net_change_in_price)
-                    curr_ask = CURRENT['OFFERS'][security]
-                    quant = min(MAX_TRADE_SZ, POS_LIMIT + CURRENT['POSITIONS'][security])
+                    print(engine.time, security, net_change_in_price)
+                    quant = int(min(MAX_TRADE_SZ, POS_LIMIT + engine.positions[j]))
                     if quant > 10:
-                        order.addBuy(security, quantity=quant, price=CURRENT['PRICE'][security])
+                        order.addBuy(security, quantity=quant, price=engine.price[j])
 
                 elif (net_change_in_price < -THRESHOLD):
-                    print(CURRENT['TIME'], security, net_change_in_price)
-                    curr_bid = CURRENT['BIDS'][security]
-                    quant = min(MAX_TRADE_SZ, POS_LIMIT - CURRENT['POSITIONS'][security])
+                    print(engine.time, security, net_change_in_price)
+                    quant = int(min(MAX_TRADE_SZ, POS_LIMIT - engine.positions[j]))
                     if quant > 10:
-                        order.addSell(security, quantity=quant, price=CURRENT['PRICE'][security])
+                        order.addSell(security, quantity=quant, price=engine.price[j])
 
-def _exit_old_trades(order):
+def _exit_old_trades(engine, order):
     ## gets out of stale positions when info expires
     ## TODO: maybe adjust this for stuff that you have future info on
-    reliability = _estimate_reliability()
-
-    for security in CURRENT['POSITIONS'].keys():
-        for price, time, source in CURRENT['PREDS'][security]:
-            if CURRENT['TIME'] > time and reliability[source] < MIN_RELIABILITY: ## TODO: only cancel for reliable news
-                print("Clearing position for ", security, "at time ", CURRENT['TIME'])
-                print("Predicted price", price, "Real price", CURRENT['PRICE'][security])
-                ## TODO: what happens if these orders dont go through?
-                if CURRENT['POSITIONS'][security] > 0:
-                    curr_bid = CURRENT['BIDS'][security]
-                    order.addSell(security, quantity=CURRENT['POSITIONS'][security], price=curr_bid)
-                if CURRENT['POSITIONS'][security] < 0:
-                    curr_ask = CURRENT['OFFERS'][security]
-                    order.addBuy(security, quantity=CURRENT['POSITIONS'][security], price=curr_ask)
-                CURRENT['PREDS'][security].remove((price, time, source))
-
-def _cancel_open_orders(order):
-    # print("CURRENT ORDERS", CURRENT['OPEN_ORDERS'])
-    for order_id in CURRENT['OPEN_ORDERS'].keys():
-        ticker = CURRENT['OPEN_ORDERS'][order_id]['ticker']
-        print("CANCEL", ticker, order_id)
-        order.addCancel(ticker=ticker, orderId=int(order_id))
+    reliability = engine.reliability
+
+    preds = engine.predictions
+    done = []
+    for row in preds.due(engine.time): # preds whose time has passed
+        price, time, source = preds.row(row)
+        if reliability[source] < MIN_RELIABILITY: ## TODO: only cancel for reliable news
+            i = preds.security[row]
+            security = engine.securities[i]
+            print("Clearing position for ", security, "at time ", engine.time)
+            print("Predicted price", price, "Real price", engine.price[i])
+            ## TODO: what happens if these orders dont go through?
+            if engine.positions[i] > 0:
+                order.addSell(security, quantity=int(engine.positions[i]), price=engine.bid[i])
+            if engine.positions[i] < 0:
+                order.addBuy(security, quantity=int(engine.positions[i]), price=engine.ask[i])
+            done.append(row)
+    preds.drop(done)
 
 ###############################################
 #### You can add more of these if you want ####
 ###############################################
 
-t.onAckRegister = ack_register_method
-t.onMarketUpdate = market_update_method
-t.onTraderUpdate = trader_update_method
-t.onNews = news_method
-#t.onTrade = trade_method
+## logs every message to msglog.jsonl and historical prices to history.csv / history.pkl
+## market updates are conflated, _info_arb_trades runs once per packet of books instead of per ticker
+ENGINE = StrategyEngine(start_reliability=START_RELIABILITY, log_file='msglog.jsonl', history_file="history.csv",
+                        on_register=on_register, on_market=on_market, on_trader=on_trader, on_news=on_news,
+                        conflate='packet', priors=PRIORS)
+ENGINE.attach(t)
 #t.onAckModifyOrders = ack_modify_orders_method
+instrument(t) # handler timings and feed lag when OX_INSTRUMENT is set (core/instrument.py)
 t.run()
\ No newline at end of file
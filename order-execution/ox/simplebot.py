@@ -1,6 +1,9 @@
 import tradersbot as tt
 import random
 
+from core.book import Book
+from core.instrument import instrument
+
 ###########################################################
 # Make sure you run pip install tradersbot before running #
 ###########################################################
@@ -39,20 +42,11 @@ def market_update_method(msg, order):
 
 	# Gets the price by averaging the highest bid (or buy order)
 	# and lowest ask (or sell order)
-	max_bid = -1;
-	min_ask = -1;
-	for bid in msg['market_state']['bids']:
-		if float(bid) > max_bid:
-			max_bid = float(bid);
-	
-	for ask in msg['market_state']['asks']:
-		if min_ask == -1 or float(ask) < min_ask:
-			min_ask =float(ask);
-
-	if min_ask == -1 or max_bid == -1:
-		price = msg['market_state']['last_price'];
+	book = Book(msg['market_state'])
+	if not book.two_sided:
+		price = book.last_price;
 	else:
-		price = (min_ask + max_bid) / 2;
+		price = book.mid();
 	SECURITIES[security] = price;
 
 	# Sets the time
@@ -106,4 +100,5 @@ t.onTraderUpdate = trader_update_method
 t.onNews = news_method
 #t.onTrade = trade_method
 #t.onAckModifyOrders = ack_modify_orders_method
+instrument(t) # handler timings and feed lag when OX_INSTRUMENT is set (core/instrument.py)
 t.run()
\ No newline at end of file
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from core.book import Book
+
+
+def _state(bids, asks, last_price=100.0):
+    return {'ticker': 'TRDRS1', 'last_price': last_price,
+            'bids': {str(p): s for p, s in bids}, 'asks': {str(p): s for p, s in asks}}
+
+
+def test_best_levels_sorted_from_unordered_dicts():
+    book = Book(_state(bids=[(99.98, 300), (99.99, 100), (99.97, 500)],
+                       asks=[(100.03, 700), (100.01, 200), (100.02, 400)]))
+    assert book.best_bid == 99.99 and book.bid_size == 100
+    assert book.best_ask == 100.01 and book.ask_size == 200
+    np.testing.assert_array_equal(book.bid_prices, [99.99, 99.98, 99.97])
+    np.testing.assert_array_equal(book.ask_prices, [100.01, 100.02, 100.03])
+    assert book.mid() == pytest.approx(100.0)
+    assert book.spread() == pytest.approx(0.02)
+
+
+def test_prices_rounded_to_precision():
+    book = Book(_state(bids=[(99.990000001, 10)], asks=[(100.0099999, 10)]))
+    assert book.best_bid == 99.99
+    assert book.best_ask == 100.01
+
+
+def test_microprice_leans_away_from_the_heavy_side():
+    book = Book(_state(bids=[(99.0, 300)], asks=[(101.0, 100)]))
+    ## three times the size bidding: price sits a quarter of the spread below the ask
+    assert book.microprice() == pytest.approx(100.5)
+    even = Book(_state(bids=[(99.0, 200)], asks=[(101.0, 200)]))
+    assert even.microprice() == pytest.approx(even.mid())
+
+
+def test_empty_side():
+    book = Book(_state(bids=[], asks=[(100.01, 200)]))
+    assert not book.two_sided
+    assert np.isnan(book.best_bid) and np.isnan(book.bid_size)
+    assert book.best_ask == 100.01
+    assert np.isnan(book.mid())
+
+
+def test_size_through_and_imbalance():
+    book = Book(_state(bids=[(99.99, 100), (99.98, 300)], asks=[(100.01, 200), (100.02, 400)]))
+    assert book.size_through(100.01, buy=True) == 200
+    assert book.size_through(100.02, buy=True) == 600
+    assert book.size_through(99.98, buy=False) == 400
+    assert book.size_through(100.00, buy=False) == 0
+    np.testing.assert_array_equal(book.cumulative(buy=True), [200, 600])
+    assert book.imbalance() == pytest.approx((100 - 200) / 300.0)
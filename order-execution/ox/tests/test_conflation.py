@@ -0,0 +1,41 @@
+from core.conflation import MarketConflator
+
+
+def test_packet_closes_when_every_security_updated():
+    conflator = MarketConflator(3)
+    assert conflator.add('A', 1) is None
+    assert conflator.add('B', 1) is None
+    assert conflator.add('A', 1) is None  # listed once
+    assert conflator.add('C', 1) == ['A', 'B', 'C']
+    assert len(conflator) == 0 and conflator.batches == 1 and conflator.updates == 4
+
+
+def test_short_packet_closes_without_the_next_seconds_update():
+    conflator = MarketConflator(3)
+    conflator.add('A', 1)
+    conflator.add('B', 1)
+    assert conflator.late(2) and not conflator.late(1)
+    ## C at t=2 closes the t=1 packet and opens the next one
+    assert conflator.add('C', 2) == ['A', 'B']
+    assert list(conflator.pending) == ['C'] and conflator.start == 2
+    assert conflator.add('A', 2) is None
+    assert conflator.add('B', 2) == ['C', 'A', 'B']
+
+
+def test_interval():
+    conflator = MarketConflator(3, interval=2)
+    assert conflator.add('A', 10) is None
+    assert conflator.add('B', 11) is None
+    assert not conflator.late(20)  # only packets split on time
+    assert not conflator.ready(11.5) and conflator.ready(12)
+    assert conflator.add('C', 12) == ['A', 'B', 'C']
+    assert conflator.add('A', 13) is None
+    assert conflator.start == 13
+
+
+def test_interval_zero_is_one_batch_per_update():
+    conflator = MarketConflator(3, interval=0)
+    assert conflator.add('A', 1) == ['A']
+    assert conflator.add('A', 1) == ['A']
+    assert conflator.add('B', 2) == ['B']
+    assert conflator.batches == 3
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from core.correlation import StreamingCorrelation
+
+
+def _series(n=300, k=4, seed=0):
+    rng = np.random.default_rng(seed)
+    common = rng.normal(size=(n, 1))
+    return 100 + np.cumsum(0.6 * common + rng.normal(size=(n, k)), axis=0)
+
+
+def test_welford_matches_numpy():
+    x = _series()
+    stream = StreamingCorrelation(x.shape[1])
+    for row in x:
+        stream.update(row)
+    np.testing.assert_allclose(stream.mean, x.mean(axis=0))
+    np.testing.assert_allclose(stream.cov(), np.cov(x.T, ddof=0))
+    np.testing.assert_allclose(stream.corr(), np.corrcoef(x.T))
+    np.testing.assert_allclose(stream.std(), x.std(axis=0))
+    assert stream.rho() == pytest.approx(np.median(np.corrcoef(x.T)))
+
+
+def test_returns_mode_uses_differences():
+    x = _series()
+    stream = StreamingCorrelation(x.shape[1], returns=True)
+    for row in x:
+        stream.update(row)
+    returns = np.diff(x, axis=0)
+    assert stream.count == len(returns)
+    np.testing.assert_allclose(stream.corr(), np.corrcoef(returns.T))
+
+
+def test_window_keeps_last_observations():
+    x = _series()
+    stream = StreamingCorrelation(x.shape[1], window=50)
+    for row in x:
+        stream.update(row)
+    np.testing.assert_allclose(stream.mean, x[-50:].mean(axis=0))
+    np.testing.assert_allclose(stream.corr(), np.corrcoef(x[-50:].T), atol=1e-9)
+
+
+def test_ewm_matches_explicit_weights():
+    x = _series()
+    stream = StreamingCorrelation(x.shape[1], halflife=10)
+    for row in x:
+        stream.update(row)
+    ## first observation seeds the mean, then each one gets alpha and decays by (1 - alpha)
+    a, n = stream.alpha, len(x)
+    weights = a * (1 - a) ** (n - 1 - np.arange(n))
+    weights[0] = (1 - a) ** (n - 1)
+    mean = weights @ x
+    centered = x - mean
+    np.testing.assert_allclose(stream.mean, mean)
+    np.testing.assert_allclose(stream.cov(), (weights[:, None] * centered).T @ centered)
+
+
+def test_prime_then_update_matches_full_history():
+    x = _series()
+    head, tail = x[:100], x[100:]
+    stream = StreamingCorrelation(x.shape[1])
+    stream.prime(len(head), head.mean(axis=0), np.cov(head.T, ddof=0))
+    for row in tail:
+        stream.update(row)
+    np.testing.assert_allclose(stream.cov(), np.cov(x.T, ddof=0))
+
+
+def test_halflife_and_window_exclusive():
+    with pytest.raises(ValueError):
+        StreamingCorrelation(2, halflife=5, window=10)
@@ -0,0 +1,148 @@
+import numpy as np
+import pytest
+
+from core.engine import StrategyEngine
+from core.orders import OrderBatch
+
+SECURITIES = ['A', 'B', 'C']
+
+
+def _register(engine, securities=SECURITIES):
+    specs = {tk: {'starting_price': 100.0, 'tradeable': True, 'precision': 2} for tk in securities}
+    engine.ack_register_method({'message_type': 'ACK REGISTER', 'elapsed_time': -1,
+                                'case_meta': {'securities': specs, 'case_length': 450}}, OrderBatch())
+    return engine
+
+
+def _market(ticker, t, mid=100.0):
+    return {'message_type': 'MARKET UPDATE', 'elapsed_time': t, 'market_state': {
+        'ticker': ticker, 'last_price': mid, 'bids': {str(mid - 0.01): 100}, 'asks': {str(mid + 0.01): 100}}}
+
+
+def _trader(t):
+    return {'message_type': 'TRADER UPDATE', 'elapsed_time': t, 'trader_state': {
+        'cash': {'USD': 0}, 'pnl': {'USD': 0}, 'positions': {tk: 0 for tk in SECURITIES}, 'open_orders': {}}}
+
+
+def _news(ticker, new_time, price, source='Jack'):
+    return {'message_type': 'NEWS', 'news': {'headline': '%s %s' % (ticker, new_time),
+                                             'body': str(price), 'source': source}}
+
+
+class _Calls(object):
+    ## records every hook call, with the engine's prices as on_market saw them
+    def __init__(self):
+        self.calls = []
+
+    def on_market(self, engine, security, order):
+        self.calls.append(('m', security, engine.time, engine.price.copy()))
+
+    def on_trader(self, engine, order):
+        self.calls.append(('t',))
+
+    def on_news(self, engine, security, price, new_time, source, order):
+        self.calls.append(('n',))
+
+    def engine(self, conflate):
+        return _register(StrategyEngine(on_market=self.on_market, on_trader=self.on_trader,
+                                        on_news=self.on_news, conflate=conflate))
+
+
+def _feed(engine, msgs):
+    handlers = {'MARKET UPDATE': engine.market_update_method, 'TRADER UPDATE': engine.trader_update_method,
+                'NEWS': engine.news_method}
+    for msg in msgs:
+        handlers[msg['message_type']](msg, OrderBatch())
+
+
+def test_short_packet_runs_before_next_book_lands():
+    hooks = _Calls()
+    engine = hooks.engine('packet')
+    _feed(engine, [_market('A', 1, 101), _market('B', 1, 102), _market('C', 2, 103)])
+    (kind, batch, time, price), = hooks.calls
+    assert batch == ['A', 'B'] and time == 1
+    np.testing.assert_array_equal(price, [101, 102, 100])  # C's t=2 book not in yet
+    assert list(engine.conflator.pending) == ['C']
+
+
+def test_trader_and_news_close_open_packet_first():
+    hooks = _Calls()
+    engine = hooks.engine('packet')
+    _feed(engine, [_market('A', 1), _market('B', 1), _trader(1), _market('C', 2), _news('A', 5, 101)])
+    assert [call[:2] for call in hooks.calls] == [('m', ['A', 'B']), ('t',), ('m', ['C']), ('n',)]
+
+
+def test_interval_closes_on_trader_only_once_run_its_length():
+    hooks = _Calls()
+    engine = hooks.engine(2)
+    _feed(engine, [_market('A', 1), _trader(1), _market('B', 2), _trader(2), _trader(3), _market('C', 3)])
+    assert [call[:2] for call in hooks.calls] == [('t',), ('t',), ('m', ['A', 'B']), ('t',)]
+    ## the next slice starts with C and closes with the first book 2s on
+    _feed(engine, [_market('A', 4), _market('B', 5)])
+    assert hooks.calls[-1][:2] == ('m', ['C', 'A', 'B'])
+
+
+def test_flush_market():
+    hooks = _Calls()
+    engine = hooks.engine('packet')
+    engine.flush_market(OrderBatch())  # nothing open
+    _feed(engine, [_market('A', 1)])
+    engine.flush_market(OrderBatch())
+    engine.flush_market(OrderBatch())
+    assert [call[:2] for call in hooks.calls] == [('m', ['A'])]
+
+
+def test_unconflated_calls_per_message():
+    hooks = _Calls()
+    engine = hooks.engine(None)
+    _feed(engine, [_market('A', 1), _market('A', 1), _trader(1)])
+    assert [call[:2] for call in hooks.calls] == [('m', 'A'), ('m', 'A'), ('t',)]
+
+
+def test_bad_conflate():
+    with pytest.raises(ValueError):
+        StrategyEngine(conflate='second')
+
+
+def _loop_fairs(engine, min_reliability, default_confidence, pred_horizon=None):
+    ## the per-prediction loop update_fairs replaced (news part, no beta fill-in)
+    preds = {s: engine.predictions.for_security(i) for i, s in enumerate(engine.securities)}
+    reliability = engine.reliability
+
+    closest_time = 100000
+    for security in engine.securities:
+        for price, new_time, source in preds[security]:
+            if new_time <= closest_time and new_time > engine.time and reliability[source] <= min_reliability:
+                closest_time = new_time
+
+    fairs = {}
+    for i, security in enumerate(engine.securities):
+        fair_pred = None
+        for price, new_time, source in preds[security]:
+            if new_time < closest_time or reliability[source] > min_reliability:
+                continue
+            if pred_horizon is not None and new_time > closest_time + pred_horizon:
+                continue
+            fair_pred, news_source = price, source
+        if fair_pred is None:
+            fairs[security] = (engine.price[i], default_confidence, 'none')
+        else:
+            fairs[security] = (fair_pred, reliability[news_source], 'news')
+    return closest_time, fairs
+
+
+@pytest.mark.parametrize('pred_horizon', [None, 0, 20])
+def test_update_fairs_matches_loop(pred_horizon):
+    engine = _register(StrategyEngine(), securities=['A', 'B', 'C', 'D'])
+    engine.reliability.prime({'Jack': (4.0, 4), 'Bob': (100.0, 4), 'Rumor': (10000.0, 4)})  # rmse 1, 5, 50
+    engine.time = 10
+    _feed(engine, [
+        _news('A', 20, 101, 'Jack'), _news('A', 20, 102, 'Bob'),  # same time: the later one wins
+        _news('A', 35, 103, 'Jack'),
+        _news('B', 5, 98, 'Jack'), _news('B', 15, 99, 'Rumor'), _news('B', 45, 97, 'Bob'),
+        _news('C', 30, 105, 'Bob'), _news('C', 30, 104, 'Jack'),
+    ])
+    closest_time, fairs = engine.update_fairs(10, 7, pred_horizon=pred_horizon)
+    assert (closest_time, fairs) == _loop_fairs(engine, 10, 7, pred_horizon)
+    assert closest_time == 20 and fairs['D'][2] == 'none'
+    assert fairs['A'][0] == (102 if pred_horizon == 0 else 103)
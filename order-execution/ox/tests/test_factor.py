@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+
+from core.factor import FactorModel
+
+
+def _prices(n_ticks=400, betas=(0.5, 1.0, 1.5, 2.0), drifts=(0.01, -0.02, 0.0, 0.03), seed=0):
+    rng = np.random.default_rng(seed)
+    market = rng.normal(size=(n_ticks, 1))
+    changes = np.asarray(drifts) + market * np.asarray(betas) + 0.3 * rng.normal(size=(n_ticks, len(betas)))
+    return 100 + np.vstack([np.zeros(len(betas)), np.cumsum(changes, axis=0)])
+
+
+def _fed(prices, **kwargs):
+    model = FactorModel(prices.shape[1], **kwargs)
+    for row in prices:
+        model.update(row)
+    return model
+
+
+def test_loadings_match_least_squares():
+    prices = _prices()
+    model = _fed(prices)
+    changes = np.diff(prices, axis=0)
+    f = changes.mean(axis=1)
+    design = np.column_stack([np.ones(len(f)), f])
+    (intercept, beta), residuals, _, _ = np.linalg.lstsq(design, changes, rcond=None)
+
+    assert model.count == len(changes)
+    np.testing.assert_allclose(model.loadings, beta)
+    np.testing.assert_allclose(model.mu, changes.mean(axis=0))
+    np.testing.assert_allclose(model.mu, intercept + beta * f.mean())
+    np.testing.assert_allclose(model.resid_var, residuals / len(f))
+
+
+def test_nan_change_counts_as_none():
+    prices = _prices(n_ticks=50)
+    gappy = prices.copy()
+    gappy[10, 2] = np.nan
+    model = _fed(gappy)
+    changes = np.diff(gappy, axis=0)
+    changes[~np.isfinite(changes)] = 0
+    np.testing.assert_allclose(model.mu, changes.mean(axis=0))
+
+
+def test_ewm_decays_by_halflife():
+    ## a constant change of 1 per tick, then 0 from some tick on: mu halves every halflife ticks
+    model = FactorModel(2, halflife=10)
+    price = np.zeros(2)
+    for _ in range(200):
+        price = price + 1
+        model.update(price)
+    np.testing.assert_allclose(model.mu, 1.0)
+    for ticks in (10, 20, 30):
+        for _ in range(10):
+            model.update(price)
+        np.testing.assert_allclose(model.mu, 0.5 ** (ticks / 10))
+
+
+def test_ewm_tracks_a_change_in_loadings():
+    before = _prices(n_ticks=300, betas=(1.0, 1.0, 1.0, 1.0), seed=1)
+    after = _prices(n_ticks=300, betas=(0.2, 1.0, 1.0, 1.8), seed=2)
+    after += before[-1] - after[0]
+    prices = np.vstack([before, after[1:]])
+    recent, full = _fed(prices, halflife=20), _fed(prices)
+    ## the exponential model forgets the first regime, the full history averages both
+    assert abs(recent.loadings[0] - 0.2) < abs(full.loadings[0] - 0.2)
+    assert abs(recent.loadings[3] - 1.8) < abs(full.loadings[3] - 1.8)
+
+
+def test_conditional_one_news():
+    model = _fed(_prices())
+    beta, resid, prior = model.loadings, model.resid_var, model.f_var
+    drift, ci = model.conditional([3], [model.mu[3] + 1.0], horizon=5)
+
+    ## Kalman update of f from its N(0, var_f) prior, through security 3
+    precision = 1 / prior + beta[3] ** 2 / resid[3]
+    factor = (beta[3] * 1.0 / resid[3]) / precision
+    assert model.factor == pytest.approx(factor)
+    assert model.factor_var == pytest.approx(1 / precision)
+    np.testing.assert_allclose(drift[:3], model.mu[:3] + beta[:3] * factor)
+    np.testing.assert_allclose(ci[:3], np.sqrt(resid[:3] * 5 + (beta[:3] * 5) ** 2 / precision))
+    assert drift[3] == model.mu[3] + 1.0 and ci[3] == 0
+
+
+def test_conditional_ci_shrinks_with_news():
+    model = _fed(_prices())
+    surprise = model.loadings * 0.5  # every security pointing at f = 0.5
+    cis, factor_vars = [], []
+    for k in range(1, 4):
+        idx = list(range(1, k + 1))
+        drift, ci = model.conditional(idx, model.mu[idx] + surprise[idx])
+        cis.append(ci[0])
+        factor_vars.append(model.factor_var)
+        assert 0 < model.factor < 0.5  # shrunk towards the prior's 0
+    assert factor_vars[0] > factor_vars[1] > factor_vars[2]
+    assert cis[0] > cis[1] > cis[2] > np.sqrt(model.resid_var[0])
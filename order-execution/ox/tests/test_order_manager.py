@@ -0,0 +1,87 @@
+from core.order_manager import OrderManager
+from core.orders import OrderBatch
+
+
+def _open(*orders):
+    ## trader_state['open_orders'] as the exchange sends it, ids as strings
+    return {str(order_id): {'ticker': ticker, 'buy': buy, 'price': price, 'quantity': quantity, 'order_id': order_id}
+            for order_id, ticker, buy, price, quantity in orders}
+
+
+def _quotes(batch):
+    return sorted((o['ticker'], o['buy'], o['price'], o['quantity']) for o in batch.orders)
+
+
+def test_keeps_matching_cancels_stale_adds_missing():
+    manager = OrderManager()
+    manager.addBuy('TRDRS1', 100, 99.99)
+    manager.addSell('TRDRS1', 100, 100.02)
+    open_orders = _open((1, 'TRDRS1', True, 99.99, 100), (2, 'TRDRS1', False, 100.03, 100))
+    batch = OrderBatch()
+    assert manager.sync(open_orders, batch) == (1, 1, 1)
+    assert batch.cancels == [{'ticker': 'TRDRS1', 'order_id': 2}]
+    assert _quotes(batch) == [('TRDRS1', False, 100.02, 100)]
+
+
+def test_unchanged_quotes_send_nothing():
+    manager = OrderManager()
+    manager.addBuy('TRDRS1', 100, 99.99 + 1e-9)  # rounds to the resting price
+    batch = OrderBatch()
+    assert manager.sync(_open((1, 'TRDRS1', True, 99.99, 100)), batch) == (1, 0, 0)
+    assert len(batch) == 0
+
+
+def test_duplicates_are_counted():
+    manager = OrderManager()
+    for _ in range(3):
+        manager.addBuy('TRDRS1', 100, 99.99)
+    batch = OrderBatch()
+    assert manager.sync(_open((1, 'TRDRS1', True, 99.99, 100)), batch) == (1, 0, 2)
+    assert _quotes(batch) == [('TRDRS1', True, 99.99, 100)] * 2
+
+
+def test_no_resend_before_next_snapshot():
+    manager = OrderManager()
+    snapshot = _open((7, 'TRDRS2', False, 50.0, 10))
+    manager.addBuy('TRDRS2', 10, 49.0)
+    first = OrderBatch()
+    assert manager.sync(snapshot, first) == (0, 1, 1)
+
+    ## same snapshot again: the add is already in flight and 7 already cancelled
+    manager.addBuy('TRDRS2', 10, 49.0)
+    second = OrderBatch()
+    assert manager.sync(snapshot, second) == (0, 0, 0)
+
+    ## a new snapshot that shows the add resting replaces what was in flight
+    manager.addBuy('TRDRS2', 10, 49.0)
+    third = OrderBatch()
+    assert manager.sync(_open((8, 'TRDRS2', True, 49.0, 10)), third) == (1, 0, 0)
+    assert len(third) == 0
+
+
+def test_max_open_orders_caps_adds():
+    manager = OrderManager(max_open_orders=2)
+    for price in (99.97, 99.98, 99.99):
+        manager.addBuy('TRDRS1', 100, price)
+    batch = OrderBatch()
+    assert manager.sync(_open((1, 'TRDRS1', True, 99.99, 100)), batch) == (1, 0, 1)
+    assert len(batch.orders) == 1
+
+
+def test_size_step_rounds_down():
+    manager = OrderManager(size_step=50)
+    manager.addBuy('TRDRS1', 130, 99.99)   # 100
+    manager.addSell('TRDRS1', 40, 100.01)  # rounds to 0, no quote
+    manager.addSell('TRDRS1', -75, 100.02) # a buy of 50
+    batch = OrderBatch()
+    assert manager.sync(_open((1, 'TRDRS1', True, 99.99, 100)), batch) == (1, 0, 1)
+    assert _quotes(batch) == [('TRDRS1', True, 100.02, 50)]
+
+
+def test_negative_and_zero_quantities():
+    manager = OrderManager()
+    manager.addBuy('TRDRS1', -100, 100.01)  # a sell
+    manager.addSell('TRDRS1', 0, 100.02)    # no quote
+    batch = OrderBatch()
+    manager.sync({}, batch)
+    assert _quotes(batch) == [('TRDRS1', False, 100.01, 100)]
@@ -0,0 +1,99 @@
+from core.order_state import OrderState
+
+
+def _ack(*orders, cancels=None):
+    ## ACK MODIFY ORDERS: orders as (order_id, ticker, buy, quantity, price[, error])
+    msg = {'message_type': 'ACK MODIFY ORDERS', 'orders': [], 'cancels': cancels or {}}
+    for order_id, ticker, buy, quantity, price, *error in orders:
+        o = {'order_id': order_id, 'ticker': ticker, 'buy': buy, 'quantity': quantity, 'price': price}
+        if error:
+            o['error'] = error[0]
+        msg['orders'].append(o)
+    return msg
+
+
+def _trade(ticker, price, quantity, buy_order_id, sell_order_id, buy=True):
+    return {'message_type': 'TRADE', 'trades': [{
+        'ticker': ticker, 'price': price, 'quantity': quantity, 'buy': buy,
+        'buy_order_id': buy_order_id, 'sell_order_id': sell_order_id}]}
+
+
+def test_passive_fill_shrinks_resting_order():
+    state = OrderState(cash=1000.0)
+    state.on_ack(_ack((1, 'TRDRS1', True, 300, 10.0)))
+    ## someone sells into our bid (they aggress, buy flag False)
+    assert state.on_trade(_trade('TRDRS1', 10.0, 100, 1, 99, buy=False)) == ['TRDRS1']
+    assert state.position('TRDRS1') == 100
+    assert state.cash == 0.0
+    assert state.open_orders[1]['quantity'] == 200
+    state.on_trade(_trade('TRDRS1', 10.0, 200, 1, 98, buy=False))
+    assert state.position('TRDRS1') == 300 and 1 not in state.open_orders
+
+
+def test_aggressive_fill():
+    state = OrderState()
+    state.on_ack(_ack((2, 'TRDRS1', False, 100, 9.9)))
+    ## our sell crosses a resting bid of someone else's: the buy side isn't ours
+    assert state.on_trade(_trade('TRDRS1', 10.0, 100, 50, 2, buy=False)) == ['TRDRS1']
+    assert state.position('TRDRS1') == -100
+    assert state.cash == 1000.0
+    assert 2 not in state.open_orders
+
+
+def test_market_order_fill_is_ours_but_never_rests():
+    state = OrderState()
+    state.on_ack(_ack((3, 'TRDRS2', True, 50, None)))
+    assert state.open_orders == {} and 3 in state.ours
+    state.on_trade(_trade('TRDRS2', 20.0, 50, 3, 60))
+    assert state.position('TRDRS2') == 50
+
+
+def test_self_trade_leaves_position_alone():
+    state = OrderState()
+    state.on_ack(_ack((1, 'TRDRS1', True, 100, 10.0), (2, 'TRDRS1', False, 100, 10.0)))
+    assert state.on_trade(_trade('TRDRS1', 10.0, 100, 1, 2)) == []
+    assert state.position('TRDRS1') == 0 and state.cash == 0.0 and state.trades == 0
+    ## both orders still filled
+    assert state.open_orders == {}
+
+
+def test_someone_elses_trade_is_ignored():
+    state = OrderState()
+    assert state.on_trade(_trade('TRDRS1', 10.0, 100, 70, 71)) == []
+    assert state.positions == {}
+
+
+def test_rejected_and_partially_acked_batch():
+    state = OrderState()
+    state.on_ack(_ack((1, 'TRDRS1', True, 100, 10.0),
+                      (None, 'TRDRS1', True, 100, 9.0, 'order limit exceeded'),
+                      (4, 'TRDRS2', False, 100, 20.0, 'position limit exceeded')))
+    assert set(state.open_orders) == {1}
+    assert state.ours == {1}
+    ## a rejected order's id isn't ours: a fill on it is someone else's
+    assert state.on_trade(_trade('TRDRS2', 20.0, 100, 80, 4)) == []
+
+
+def test_cancels_close_orders_either_way():
+    state = OrderState()
+    state.on_ack(_ack((1, 'TRDRS1', True, 100, 10.0), (2, 'TRDRS1', True, 100, 9.0)))
+    state.on_ack(_ack(cancels={'1': None, '2': 'order already filled'}))
+    assert state.open_orders == {}
+
+
+def test_reconcile_counts_drift():
+    state = OrderState()
+    state.on_ack(_ack((1, 'TRDRS1', True, 300, 10.0)))
+    state.on_trade(_trade('TRDRS1', 10.0, 100, 1, 99, buy=False))
+    snapshot = {'positions': {'TRDRS1': 100}, 'cash': {'USD': -1000.0},
+                'open_orders': {'1': {'ticker': 'TRDRS1', 'buy': True, 'quantity': 200, 'price': 10.0, 'order_id': 1}}}
+    state.reconcile(snapshot)
+    assert state.drift == 0
+
+    ## the exchange saw a fill we missed, and an order we never got an ack for
+    snapshot = {'positions': {'TRDRS1': 300}, 'cash': {'USD': -3000.0},
+                'open_orders': {'5': {'ticker': 'TRDRS1', 'buy': False, 'quantity': 10, 'price': 11.0, 'order_id': 5}}}
+    state.reconcile(snapshot)
+    assert state.drift == 1
+    assert state.position('TRDRS1') == 300 and state.cash == -3000.0
+    assert set(state.open_orders) == {5} and 5 in state.ours
@@ -0,0 +1,65 @@
+import numpy as np
+
+from core.predictions import PredictionStore
+
+
+def _store():
+    store = PredictionStore(capacity=2)  # small, so adding also exercises _grow
+    store.add(0, 101.0, 30.0, 'Jack')
+    store.add(1, 55.0, 10.0, 'Jill')
+    store.add(0, 102.0, 20.0, 'Jack')
+    store.add(2, 9.0, 40.0, 'Jill')
+    return store
+
+
+def test_add_keeps_arrival_order():
+    store = _store()
+    assert len(store) == 4
+    np.testing.assert_array_equal(store.new_time, [30, 10, 20, 40])
+    np.testing.assert_array_equal(store.security, [0, 1, 0, 2])
+    assert store.sources == ['Jack', 'Jill']
+    assert store.for_security(0) == [(101.0, 30.0, 'Jack'), (102.0, 20.0, 'Jack')]
+
+
+def test_expire_drops_older_targets():
+    store = _store()
+    assert store.expire(10) == 0
+    assert store.expire(25) == 2
+    np.testing.assert_array_equal(store.new_time, [30, 40])
+    np.testing.assert_array_equal(store.price, [101.0, 9.0])
+    assert store.expire(25) == 0
+
+
+def test_due_then_drop():
+    store = _store()
+    due = store.due(25)
+    np.testing.assert_array_equal(due, [1, 2])  # row order, not time order
+    assert [store.row(r) for r in due] == [(55.0, 10.0, 'Jill'), (102.0, 20.0, 'Jack')]
+    store.drop(due)
+    np.testing.assert_array_equal(store.new_time, [30, 40])
+    assert len(store.due(25)) == 0
+    ## the dropped rows' heap entries go at the next expire past them, without dropping anything else
+    assert store.expire(26) == 0
+    assert len(store) == 2
+
+
+def test_next_after():
+    store = _store()
+    assert store.next_after(0) == 10
+    assert store.next_after(10) == 20
+    assert store.next_after(40) == np.inf
+    jack = store.source == store.source_index['Jack']
+    assert store.next_after(0, jack) == 20
+    assert store.next_after(20, jack) == 30
+    assert store.next_after(30, jack) == np.inf
+
+
+def test_queries_follow_changes():
+    store = _store()
+    assert store.next_after(0) == 10
+    store.add(3, 1.0, 5.0, 'Jack')
+    assert store.next_after(0) == 5
+    np.testing.assert_array_equal(store.due(11), [1, 4])
+    store.expire(11)
+    assert store.next_after(0) == 20
+    np.testing.assert_array_equal(store.due(31), [0, 1])
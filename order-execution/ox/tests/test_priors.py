@@ -0,0 +1,115 @@
+import json
+import types
+
+import numpy as np
+import pytest
+
+from core.correlation import StreamingCorrelation
+from core.factor import FactorModel
+from core.priors import PriorCache, case_key
+from core.reliability import ReliabilityTracker
+
+META = {'securities': ['TRDRS1', 'TRDRS2', 'TRDRS3'], 'case_length': 450}
+
+
+def _engine(securities=('TRDRS1', 'TRDRS2', 'TRDRS3')):
+    ## the parts of a StrategyEngine a PriorCache reads and primes
+    n = len(securities)
+    return types.SimpleNamespace(securities=list(securities), reliability=ReliabilityTracker(window=1),
+                                 rho=StreamingCorrelation(n, returns=True), factor=FactorModel(n))
+
+
+def _session(engine, seed=0, ticks=200):
+    rng = np.random.default_rng(seed)
+    prices = 100 + np.cumsum(rng.normal(size=(ticks, len(engine.securities))), axis=0)
+    engine.reliability.add('Jack', 0, prices[10, 0] + 2.0, new_time=10)
+    engine.reliability.add('Jill', 1, prices[20, 1] - 1.0, new_time=20)
+    for t, row in enumerate(prices):
+        engine.reliability.observe(t, row)
+        engine.rho.update(row)
+        engine.factor.update(row)
+    return prices
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / 'priors.json')
+    first = _engine()
+    _session(first)
+    cache = PriorCache(path)
+    assert not cache.apply(first, META)  # no file yet
+    cache.update(first)
+    cache.save()
+
+    with open(path) as f:
+        entry = json.load(f)[case_key(META)]
+    assert entry['sessions'] == 1
+    assert entry['sources']['Jack'] == [pytest.approx(4.0), 1]
+    assert entry['returns']['count'] == first.rho.count
+
+    second = _engine()
+    cache = PriorCache(path, returns_weight=50)
+    assert cache.apply(second, META)
+    assert second.reliability['Jack'] == pytest.approx(first.reliability['Jack'])
+    assert second.reliability['Jill'] == pytest.approx(first.reliability['Jill'])
+    np.testing.assert_allclose(second.rho.mean, first.rho.mean)
+    np.testing.assert_allclose(second.rho.cov(), first.rho.cov())
+    assert second.rho.count == 50
+    np.testing.assert_allclose(second.factor.mu, first.rho.mean)
+
+    cache.update(second)
+    cache.update(second)  # periodic saves replace the entry, they don't count sessions
+    cache.save()
+    with open(path) as f:
+        assert json.load(f)[case_key(META)]['sessions'] == 2
+
+
+def test_source_weight_caps_prior(tmp_path):
+    path = str(tmp_path / 'priors.json')
+    with open(path, 'w') as f:
+        json.dump({case_key(META): {'sessions': 5, 'sources': {'Jack': [900.0, 100]}}}, f)
+    engine = _engine()
+    assert PriorCache(path, source_weight=10).apply(engine, META)
+    assert engine.reliability.count('Jack') == 10
+    assert engine.reliability['Jack'] == pytest.approx(3.0)
+    assert engine.rho.count == 0  # no returns stored, nothing primed
+
+
+def test_returns_follow_ticker_order(tmp_path):
+    path = str(tmp_path / 'priors.json')
+    first = _engine()
+    _session(first)
+    cache = PriorCache(path)
+    cache.apply(first, META)
+    cache.update(first)
+    cache.save()
+
+    reordered = _engine(['TRDRS3', 'TRDRS1', 'TRDRS2'])
+    PriorCache(path).apply(reordered, META)
+    order = [2, 0, 1]
+    np.testing.assert_allclose(reordered.rho.mean, first.rho.mean[order])
+    np.testing.assert_allclose(reordered.rho.cov(), first.rho.cov()[np.ix_(order, order)])
+
+
+def test_keys_keep_cases_apart(tmp_path):
+    assert case_key(META, 'supp_1') != case_key(META, 'supp_2')
+    assert case_key(dict(META, news_sources=['Jack'])) != case_key(dict(META, news_sources=['Jill']))
+    assert case_key(dict(META, news_sources=['Jack', 'Jill'])) == case_key(dict(META, news_sources=['Jill', 'Jack']))
+
+    path = str(tmp_path / 'priors.json')
+    one, two = PriorCache(path, case='supp_1'), PriorCache(path, case='supp_2')
+    e1, e2 = _engine(), _engine()
+    one.apply(e1, META)
+    two.apply(e2, META)
+    _session(e1, seed=1)
+    one.update(e1)
+    one.save()
+    _session(e2, seed=2)
+    two.update(e2)
+    two.save()  # rereads the file, so supp_1's entry written since survives
+
+    with open(path) as f:
+        entries = json.load(f)
+    assert set(entries) == {case_key(META, 'supp_1'), case_key(META, 'supp_2')}
+    fresh = _engine()
+    PriorCache(path, case='supp_1').apply(fresh, META)
+    np.testing.assert_allclose(fresh.rho.mean, e1.rho.mean)
@@ -0,0 +1,46 @@
+import math
+
+from core.reliability import ReliabilityTracker
+
+
+def test_unscored_until_window_passes():
+    tracker = ReliabilityTracker(start_reliability=30, window=5)
+    tracker.add('Jack', 0, 100.0, new_time=10)
+    for t in range(0, 15):
+        tracker.observe(t, [104.0])
+        assert tracker.count('Jack') == 0
+        assert tracker['Jack'] == 30
+
+    tracker.observe(15, [104.0])
+    assert tracker.count('Jack') == 1
+    assert tracker['Jack'] == 4.0
+
+
+def test_scores_window_average():
+    tracker = ReliabilityTracker(window=3)
+    tracker.add('Jill', 1, 50.0, new_time=2)
+    prices = {0: 0, 1: 0, 2: 51.0, 3: 52.0, 4: 56.0, 5: 99.0, 6: 99.0}
+    for t in range(7):
+        tracker.observe(t, [0.0, prices[t]])
+    ## [2, 5) averages 53 against a prediction of 50; later prices don't count
+    assert tracker['Jill'] == 3.0
+
+
+def test_rmse_over_sources():
+    tracker = ReliabilityTracker(window=1)
+    tracker.add('a', 0, 10.0, new_time=0)
+    tracker.add('a', 0, 14.0, new_time=0)
+    tracker.add('b', 0, 11.0, new_time=0)
+    tracker.observe(0, [11.0])
+    tracker.observe(1, [0.0])
+    assert tracker['a'] == math.sqrt((1 + 9) / 2.0)
+    assert tracker['b'] == 0.0
+    assert sorted(tracker.keys()) == ['a', 'b']
+
+
+def test_prime_caps_weight():
+    tracker = ReliabilityTracker()
+    tracker.prime({'a': (400.0, 100), 'b': (9.0, 0)}, weight=10)
+    assert tracker.count('a') == 10
+    assert tracker['a'] == 2.0
+    assert 'b' not in tracker